@@ -0,0 +1,132 @@
+"""
+=======================
+Audio latency benchmark
+=======================
+
+This example measures how long the audio methods of
+:class:`expyfun.ExperimentController` (``load_buffer``, ``play``,
+``start_stimulus`` and ``stop``) take, for different buffer durations and
+numbers of distinct stimuli, using the silent Pyglet audio driver and the
+dummy TDT. It prints percentiles of the wall-clock times and can write them
+to a JSON report, e.g. to compare expyfun versions before deploying one::
+
+    $ python audio_latency_benchmark.py --json report.json
+
+Because no sound is played, this measures the overhead of expyfun itself
+rather than that of the audio hardware (use ``sync_test.py`` for that).
+"""
+# Author: Eric Larson <larsoner@uw.edu>
+#
+# License: BSD (3-clause)
+
+import os
+os.environ['_EXPYFUN_SILENT'] = 'true'  # must be set before importing expyfun
+
+import argparse  # noqa: E402
+import datetime  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import sys  # noqa: E402
+from timeit import default_timer as clock  # noqa: E402
+
+import numpy as np  # noqa: E402
+import pyglet  # noqa: E402
+
+import expyfun  # noqa: E402
+from expyfun import ExperimentController, building_doc  # noqa: E402
+
+print(__doc__)
+
+backends = dict(pyglet='pyglet', tdt=dict(TYPE='tdt', TDT_MODEL='dummy'))
+durations = (0.1, 1., 10.)  # seconds
+n_stimuli = (1, 20)  # distinct stimuli, cycled through
+modes = ('array', 'preloaded')  # pass arrays or names of preloaded stimuli
+n_trials = 40
+percentiles = (50, 90, 99)
+if building_doc:  # keep the doc build quick
+    durations, n_stimuli, n_trials = (0.1,), (1,), 2
+
+
+def _time(fun, *args, **kwargs):
+    t0 = clock()
+    fun(*args, **kwargs)
+    return clock() - t0
+
+
+def run_benchmark(backend, duration, n_stim, mode):
+    """Time the audio methods, returning times (in sec) for each"""
+    times = dict(load_buffer=list(), play=list(), start_stimulus=list(),
+                 stop=list())
+    rng = np.random.RandomState(0)
+    with ExperimentController('AudioBenchmark', audio_controller=backend,
+                              response_device='keyboard', stim_fs=24414,
+                              window_size=(1, 1), full_screen=False,
+                              participant='s', session='0', output_dir=None,
+                              suppress_resamp=True, version='dev',
+                              verbose=False) as ec:
+        # RMS of 0.01, so that the RMS checks pass
+        stimuli = [0.01 * rng.randn(int(duration * ec.fs))
+                   for _ in range(n_stim)]
+        names = [str(ii) for ii in range(n_stim)]
+        if mode == 'preloaded':
+            ec.preload_stimuli(dict(zip(names, stimuli)))
+            stimuli = names
+        for ii in range(n_trials):
+            stim = stimuli[ii % n_stim]
+            times['load_buffer'].append(_time(ec.load_buffer, stim))
+            times['play'].append(_time(ec.play))
+            times['stop'].append(_time(ec.stop))
+            ec.load_buffer(stim)
+            times['start_stimulus'].append(_time(
+                ec.start_stimulus, start_of_trial=False, flip=False))
+            ec.stop()
+    return times
+
+
+def main(json_fname=None):
+    results = list()
+    print('%-7s %8s %6s %-9s %-14s %s'
+          % ('backend', 'dur (s)', 'n_stim', 'mode', 'method',
+             '  '.join('p%-5d' % p for p in percentiles) + '  (ms)'))
+    for backend in sorted(backends):
+        for duration in durations:
+            for n_stim in n_stimuli:
+                for mode in modes:
+                    times = run_benchmark(backends[backend], duration, n_stim,
+                                          mode)
+                    for method in sorted(times):
+                        t = 1000 * np.array(times[method])
+                        pct = np.percentile(t, percentiles)
+                        print('%-7s %8.1f %6d %-9s %-14s %s'
+                              % (backend, duration, n_stim, mode, method,
+                                 '  '.join('%6.2f' % p for p in pct)))
+                        results.append(dict(
+                            backend=backend, duration=duration,
+                            n_stimuli=n_stim, mode=mode, method=method,
+                            n=len(t), mean_ms=float(np.mean(t)),
+                            max_ms=float(np.max(t)),
+                            percentiles_ms=dict(('p%d' % p, float(v))
+                                                for p, v in
+                                                zip(percentiles, pct))))
+    if json_fname is not None:
+        report = dict(
+            date=datetime.datetime.now().isoformat(),
+            expyfun=expyfun.__version__, numpy=np.__version__,
+            pyglet=pyglet.version, python=sys.version.split()[0],
+            platform=platform.platform(), n_trials=n_trials,
+            results=results)
+        with open(json_fname, 'w') as fid:
+            json.dump(report, fid, indent=2, sort_keys=True)
+        print('Wrote %s' % json_fname)
+    return results
+
+
+if __name__ == '__main__':
+    json_fname = None
+    if not building_doc:  # otherwise these are the sphinx-build arguments
+        parser = argparse.ArgumentParser(
+            description='Audio latency benchmark')
+        parser.add_argument('--json', dest='json_fname', default=None,
+                            help='Write a JSON report to this file')
+        json_fname = parser.parse_args().json_fname
+    main(json_fname)
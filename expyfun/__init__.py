@@ -12,7 +12,8 @@ from ._git import assert_version, download_version
 from ._experiment_controller import (ExperimentController, wait_secs,
                                      get_keyboard_input)
 from ._eyelink_controller import EyelinkController
-from ._trigger_controllers import decimals_to_binary, binary_to_decimals
+from ._trigger_controllers import (decimals_to_binary, binary_to_decimals,
+                                   TriggerController, register_trigger_backend)
 from ._tdt_controller import TDTController
 from . import analyze
 from . import codeblocks
@@ -0,0 +1,139 @@
+"""Writers for the experiment data (.tab) file"""
+
+# Authors: Eric Larson <larsoner@uw.edu>
+#
+# License: BSD (3-clause)
+
+from collections import deque
+import gzip
+import io
+from threading import Thread, Event, Lock
+
+from ._utils import _sanitize, string_types, text_type
+
+# values that cannot change between being queued and being formatted
+_immutable_types = (string_types, int, float, bool, type(None))
+
+
+_compression_exts = {None: '.tab', 'gzip': '.tab.gz', 'zstd': '.tab.zst'}
+
+
+def _open_data_file(fname, compression):
+    """Open a data file for appending text, possibly compressed
+
+    For compressed files, flushing ends a compressed block, so everything
+    written up to the last flush can be decompressed.
+    """
+    if compression is None:
+        return open(fname, 'a')
+    elif compression == 'gzip':
+        fid = gzip.GzipFile(fname, 'ab')
+    else:  # compression == 'zstd'
+        import zstandard
+        fid = zstandard.ZstdCompressor().stream_writer(open(fname, 'ab'))
+    return io.TextIOWrapper(fid, encoding='utf-8')
+
+
+class _TabWriter(object):
+    """Write (timestamp, event, value) lines to an open text file"""
+
+    def __init__(self, fid):
+        self.fid = fid
+
+    def write(self, timestamp, event_type, value):
+        if not self.fid.closed:
+            self.fid.write('\t'.join(_sanitize(x) for x in
+                                     (timestamp, event_type, value)) + '\n')
+
+    def flush(self):
+        if not self.fid.closed:
+            self.fid.flush()
+
+    def close(self):
+        self.fid.close()
+
+
+class _WriterGroup(object):
+    """Pass each line on to several writers"""
+
+    def __init__(self, writers):
+        self._writers = list(writers)
+
+    def write(self, timestamp, event_type, value):
+        for writer in self._writers:
+            writer.write(timestamp, event_type, value)
+
+    def flush(self):
+        for writer in self._writers:
+            writer.flush()
+
+    def close(self):
+        for writer in self._writers:
+            writer.close()
+
+
+class _ThreadedWriter(object):
+    """Hand lines off to a writer that runs in a background thread
+
+    Callers only append to a ``deque`` (atomic, so no lock is needed on the
+    hot path). The thread formats and writes whatever has been queued, and
+    :meth:`flush` drains the queue on the calling thread, so that on return
+    every line written so far is in the file. If writing fails in the
+    thread, the error is raised by the next call to :meth:`write`,
+    :meth:`flush`, or :meth:`close`.
+    """
+
+    def __init__(self, writer):
+        self._writer = writer
+        self._queue = deque()
+        self._lock = Lock()  # serializes draining (thread vs. flush)
+        self._wake = Event()
+        self._closing = False
+        self._error = None
+        self._thread = Thread(target=self._run, name='expyfun-data-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, timestamp, event_type, value):
+        self._check_error()
+        # mutable objects (lists, arrays, ...) could change before the
+        # thread gets to them, so convert those to text right away (this
+        # gives the same result as letting _sanitize do it later)
+        if not isinstance(value, _immutable_types):
+            value = text_type(value)
+        self._queue.append((timestamp, event_type, value))
+        self._wake.set()
+
+    def _drain(self):
+        with self._lock:
+            while self._queue:
+                self._writer.write(*self._queue.popleft())
+
+    def _run(self):
+        while not self._closing:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self._drain()
+            except Exception as exp:  # keep it for the main thread
+                self._error = exp
+                break
+
+    def flush(self):
+        self._check_error()
+        self._drain()
+        self._writer.flush()
+
+    def close(self):
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
+        try:
+            self._check_error()
+            self._drain()
+        finally:
+            self._writer.close()
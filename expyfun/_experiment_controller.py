@@ -9,16 +9,21 @@
 import numpy as np
 import os
 import warnings
+from collections import OrderedDict
+import hashlib
 from os import path as op
 from functools import partial
 import traceback as tb
 
 from ._utils import (get_config, verbose_dec, _check_pyglet_version, wait_secs,
-                     running_rms, _sanitize, logger, ZeroClock, date_str,
+                     _max_running_rms, logger, ZeroClock, date_str,
                      check_units, set_log_file, flush_logger,
                      string_types, _fix_audio_dims, input)
-from ._tdt_controller import TDTController
-from ._trigger_controllers import ParallelTrigger
+from ._data_writer import (_TabWriter, _ThreadedWriter, _WriterGroup,
+                           _open_data_file, _compression_exts)
+from .io._binary import _BinaryWriter
+from ._tdt_controller import TDTController, _MAX_SAMPLES
+from ._trigger_controllers import _trigger_backends
 from ._sound_controllers import PygletSoundController, SoundPlayer
 from ._input_controllers import Keyboard, CedrusBox, Mouse
 from .visual import Text, Rectangle, Video, _convert_color
@@ -80,12 +85,15 @@ class ExperimentController(object):
         If ``None``, a GUI will be used to acquire this information.
     session : str | None
         If ``None``, a GUI will be used to acquire this information.
-    trigger_controller : str | None
+    trigger_controller : str | dict | None
         If ``None``, the type will be read from the system configuration file.
-        If a string, must be 'dummy', 'parallel', or 'tdt'. Note that by
+        If a string, must be 'dummy', 'parallel', 'tdt', 'file', or a name
+        given to :func:`register_trigger_backend`. Note that by
         default the mode is 'dummy', since setting up the parallel port
         can be a pain. Can also be a dict with entries 'type' ('parallel')
-        and 'address' (e.g., '/dev/parport0').
+        and 'address' (e.g., '/dev/parport0'), or 'type' ('file') and
+        'fname' (a file or pipe to which each trigger is appended as its
+        time stamp and value, little-endian float64 and uint32).
     check_rms : str | None
         Method to use in checking stimulus RMS to ensure appropriate levels.
         Possible values are ``None``, ``wholefile``, and ``windowed`` (the
@@ -98,6 +106,30 @@ class ExperimentController(object):
         the expected version of the expyfun codebase is being used when running
         experiments. To override version checking (e.g., during development)
         use ``version='dev'``.
+    data_writer : str
+        How lines are written to the data file. ``'direct'`` (default) writes
+        each line from `write_data_line` immediately. ``'thread'`` only queues
+        the line and leaves the formatting and file I/O to a background thread;
+        the queue is drained whenever the data file is flushed (e.g., by
+        `trial_ok` or `flush`). Both produce identical files.
+    data_binary : bool
+        If True, also write the data lines to a compact binary event log
+        (``.bin``, plus a ``.bin.val`` file with the values) next to the
+        ``.tab`` file, which can be read quickly with
+        :func:`expyfun.io.read_tab_binary`.
+    data_compression : str | None
+        If ``'gzip'`` or ``'zstd'`` (requires the ``zstandard`` package),
+        compress the data file as it is written (to ``.tab.gz`` or
+        ``.tab.zst``, respectively). Every flush (e.g., by `trial_ok`) ends a
+        compressed block, so the file can be read up to that point even if
+        the experiment crashes. The functions in :mod:`expyfun.io`
+        decompress these files transparently.
+    resample_cache : bool
+        If True, keep the result of every resampling (when ``stim_fs``
+        differs from the sample rate of the sound device) keyed by the
+        content of the stimulus, so that stimuli that are loaded repeatedly
+        are only resampled once. This uses memory for one resampled copy of
+        each distinct stimulus.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see expyfun.verbose).
 
@@ -119,14 +151,23 @@ class ExperimentController(object):
                  full_screen=True, force_quit=None, participant=None,
                  monitor=None, trigger_controller=None, session=None,
                  check_rms='windowed', suppress_resamp=False, version=None,
-                 enable_video=False, verbose=None):
+                 enable_video=False, data_writer='direct', data_binary=False,
+                 data_compression=None, resample_cache=False,
+                 verbose=None):
         # initialize some values
         self._stim_fs = stim_fs
         self._stim_rms = stim_rms
         self._stim_db = stim_db
         self._noise_db = noise_db
         self._stim_scaler = None
+        self._stim_bank = dict()  # name -> (samples, n_samples)
+        self._stim_prepared = OrderedDict()  # name -> (buf, nbytes, scaler)
+        self._stim_max_bytes = None
+        self._stim_nbytes = 0
+        self._queue_onsets = list()  # relative to the start of playback
+        self._play_time = None
         self._suppress_resamp = suppress_resamp
+        self._resample_cache = dict() if resample_cache else None
         self._enable_video = enable_video
         self.video = None
         self._bgcolor = _convert_color('k')
@@ -139,6 +180,8 @@ class ExperimentController(object):
         self._id_call_dict = dict(ec_id=self._stamp_ec_id)
         self._ac = None
         self._data_file = None
+        self._data_fname = None
+        self._data_writer = None
         self._clock = ZeroClock()
         self._master_clock = self._clock.get_time
 
@@ -185,6 +228,13 @@ class ExperimentController(object):
             if len(fixed_list) < len(self._exp_info):
                 _get_items(self._exp_info, fixed=fixed_list, title=exp_name)
 
+            if data_writer not in ('direct', 'thread'):
+                raise ValueError('data_writer must be "direct" or "thread", '
+                                 'got {0}'.format(data_writer))
+            if data_compression not in _compression_exts:
+                raise ValueError('data_compression must be None, "gzip", or '
+                                 '"zstd", got {0}'.format(data_compression))
+
             #
             # initialize log file
             #
@@ -203,10 +253,20 @@ class ExperimentController(object):
                 closer = partial(set_log_file, None)
                 self._extra_cleanup_fun.append(closer)
                 # initialize data file
-                self._data_file = open(self._output_dir + '.tab', 'a')
-                self._extra_cleanup_fun.append(self._data_file.close)
+                ext = _compression_exts[data_compression]
+                self._data_fname = self._output_dir + ext
+                self._data_file = _open_data_file(self._data_fname,
+                                                  data_compression)
                 self._data_file.write('# ' + str(self._exp_info) + '\n')
-                self.write_data_line('event', 'value', 'timestamp')
+                self._data_writer = _TabWriter(self._data_file)
+                self._data_writer.write('timestamp', 'event', 'value')
+                if data_binary:
+                    self._data_writer = _WriterGroup([
+                        self._data_writer,
+                        _BinaryWriter(self._output_dir + '.bin')])
+                if data_writer == 'thread':
+                    self._data_writer = _ThreadedWriter(self._data_writer)
+                self._extra_cleanup_fun.append(self._data_writer.close)
 
             #
             # set up monitor
@@ -340,25 +400,25 @@ class ExperimentController(object):
                 trigger_controller = get_config('TRIGGER_CONTROLLER', 'dummy')
             if isinstance(trigger_controller, string_types):
                 trigger_controller = dict(type=trigger_controller)
+            trigger_controller = dict(trigger_controller)  # we modify it
             logger.info('Expyfun: Initializing {} triggering mode'
                         ''.format(trigger_controller['type']))
-            if trigger_controller['type'] == 'tdt':
-                if not isinstance(self._ac, TDTController):
-                    raise ValueError('trigger_controller can only be "tdt" if '
-                                     'tdt is used for audio')
-                self._stamp_ttl_triggers = self._ac.stamp_triggers
-            elif trigger_controller['type'] in ['parallel', 'dummy']:
-                if 'address' not in trigger_controller['type']:
-                    addr = get_config('TRIGGER_ADDRESS')
-                    trigger_controller['address'] = addr
-                out = ParallelTrigger(trigger_controller['type'],
-                                      trigger_controller.get('address'))
-                self._stamp_ttl_triggers = out.stamp_triggers
+            if trigger_controller['type'] not in _trigger_backends:
+                raise ValueError('trigger_controller type must be one of '
+                                 '{0}, not {1}'.format(
+                                     ', '.join('"%s"' % b for b in
+                                               sorted(_trigger_backends)),
+                                     trigger_controller['type']))
+            out = _trigger_backends[trigger_controller['type']](
+                self, trigger_controller)
+            if out is not self._ac:
                 self._extra_cleanup_fun.append(out.close)
-            else:
-                raise ValueError('trigger_controller type must be '
-                                 '"parallel", "dummy", or "tdt", not '
-                                 '{0}'.format(trigger_controller['type']))
+            self._stamp_ttl_triggers = out.stamp_triggers
+            # controllers without a _scheduler (e.g., plain registered
+            # objects) have nothing to keep in sync with
+            self._ttl_scheduler = getattr(out, '_scheduler', None)
+            if self._ttl_scheduler is not None:
+                self._ttl_scheduler.clock = self._master_clock  # our time
             self._id_call_dict['ttl_id'] = self._stamp_binary_id
 
             # other basic components
@@ -1362,13 +1422,25 @@ class ExperimentController(object):
 
         Parameters
         ----------
-        samples : np.array
+        samples : np.array | str
             Audio data as floats scaled to (-1,+1), formatted as numpy array
-            with shape (1, N), (2, N), or (N,) dtype float32.
+            with shape (1, N), (2, N), or (N,) dtype float32. Can also be
+            the name of a stimulus given to
+            :meth:`ExperimentController.preload_stimuli`.
+
+        Returns
+        -------
+        upload : object | None
+            When the TDT writes audio in the background (its
+            ``'TDT_UPLOAD'`` parameter is ``'async'``), the upload in
+            progress, whose ``done()`` method tells whether it has finished
+            and whose ``wait()`` method waits for it to finish. Playback
+            waits for it automatically. Otherwise None.
 
         See Also
         --------
         ExperimentController.play
+        ExperimentController.preload_stimuli
         ExperimentController.set_stim_db
         ExperimentController.start_stimulus
         ExperimentController.stop
@@ -1376,11 +1448,212 @@ class ExperimentController(object):
         if self._playing:
             raise RuntimeError('Previous audio must be stopped before loading '
                                'the buffer')
-        samples = self._validate_audio(samples)
-        samples *= self._stim_scaler
-        logger.exp('Expyfun: Loading {} samples to buffer'
-                   ''.format(samples.size))
-        self._ac.load_buffer(samples)
+        if isinstance(samples, string_types):
+            buf, n_samples = self._get_prepared(samples)
+            logger.exp('Expyfun: Loading {} samples to buffer ({})'
+                       ''.format(n_samples, samples))
+            upload = self._ac._load_prepared(buf)
+        else:
+            samples = self._validate_audio(samples, self._stim_scaler)
+            logger.exp('Expyfun: Loading {} samples to buffer'
+                       ''.format(samples.size))
+            upload = self._ac.load_buffer(samples)
+        self._queue_onsets = list()
+        self._play_time = None
+        return upload
+
+    def queue_buffer(self, samples):
+        """Append audio data to the audio buffer
+
+        The data are played immediately after the loaded (and previously
+        queued) data, without a gap. They can be queued before or during
+        playback. The onset of each queued buffer is written to the data
+        file as a ``play_queued`` event (with the number of the queued
+        buffer as the value).
+
+        Parameters
+        ----------
+        samples : np.array | str
+            Audio data or the name of a preloaded stimulus (see
+            :meth:`ExperimentController.load_buffer`).
+
+        See Also
+        --------
+        ExperimentController.load_buffer
+        ExperimentController.play
+        ExperimentController.preload_stimuli
+
+        Notes
+        -----
+        Queued buffers are part of the audio buffer until the next call to
+        :meth:`ExperimentController.load_buffer`, e.g.
+        :meth:`ExperimentController.stop` rewinds to the beginning of the
+        loaded buffer. Buffers cannot be queued after playback has finished.
+        """
+        if self._play_time is not None and not self._playing:
+            raise RuntimeError('Audio cannot be queued after playback has '
+                               'finished')
+        if isinstance(samples, string_types):
+            buf = self._get_prepared(samples)[0]
+        else:
+            samples = self._validate_audio(samples, self._stim_scaler)
+            buf = self._ac._prepare_buffer(samples)[0]
+        onset = self._ac._queue_prepared(buf)
+        self._queue_onsets.append(onset)
+        logger.exp('Expyfun: Queued buffer {0} at {1:0.6f} sec'
+                   ''.format(len(self._queue_onsets), onset))
+        if self._play_time is not None:
+            self.write_data_line('play_queued', len(self._queue_onsets),
+                                 self._play_time + onset)
+
+    def load_stream(self, fname):
+        """Load a WAV file to be streamed from disk
+
+        Unlike :meth:`ExperimentController.load_buffer`, the data are not
+        loaded into memory: the file is memory-mapped, and read, scaled
+        (according to :meth:`ExperimentController.set_stim_db`), and
+        converted in small chunks during playback. This is useful for long
+        stimuli.
+
+        Parameters
+        ----------
+        fname : str
+            The WAV file to stream. It must be mono or stereo, with a sample
+            rate equal to that of the sound device (``ec.fs``).
+
+        See Also
+        --------
+        ExperimentController.load_buffer
+        ExperimentController.play
+        ExperimentController.start_stimulus
+        ExperimentController.stop
+
+        Notes
+        -----
+        No RMS checking is done, and values outside +/- 1 (after scaling) are
+        clipped. With a TDT, this streams through a circular buffer (so the
+        stimulus length is not limited by the buffer size), which requires a
+        circuit that supports it (see :meth:`TDTController.load_stream`).
+        Underruns (when the data cannot be written fast enough) are logged
+        as warnings.
+        """
+        if self._playing:
+            raise RuntimeError('Previous audio must be stopped before loading '
+                               'the buffer')
+        from scipy.io import wavfile
+        fs, data = wavfile.read(fname, mmap=True)
+        if not np.allclose(fs, self.fs, rtol=0, atol=0.5):
+            raise ValueError('WAV file sample rate ({0}) must match the '
+                             'sound device sample rate ({1})'
+                             ''.format(fs, self.fs))
+        if data.ndim == 2 and data.shape[1] > 2:
+            raise ValueError('Sound data has more than two channels.')
+        logger.exp('Expyfun: Streaming {} samples from {}'
+                   ''.format(len(data), op.basename(fname)))
+        self._ac.load_stream(data, self._stim_scaler)
+        self._queue_onsets = list()
+        self._play_time = None
+
+    def preload_stimuli(self, stimuli, max_bytes=None):
+        """Prepare stimuli ahead of time so they can be loaded by name
+
+        Stimuli are checked (as in :meth:`ExperimentController.load_buffer`),
+        scaled, and converted to the format of the audio device once, so
+        that ``ec.load_buffer(name)`` only has to hand the ready buffer to
+        the device.
+
+        Parameters
+        ----------
+        stimuli : dict
+            Audio data (as for :meth:`ExperimentController.load_buffer`)
+            keyed by stimulus name. Stimuli with names that were already
+            preloaded are replaced.
+        max_bytes : int | float | None
+            The maximum size of the prepared buffers. When exceeded, the
+            least recently loaded stimuli are discarded, and prepared again
+            if they are loaded later (the original data are kept without
+            copying). ``np.inf`` means no limit, and None (default) keeps
+            the current limit (initially, there is none).
+
+        Returns
+        -------
+        nbytes : int
+            The total size of the prepared buffers.
+
+        See Also
+        --------
+        ExperimentController.load_buffer
+        ExperimentController.set_stim_db
+
+        Notes
+        -----
+        If the stimulus level is changed with
+        :meth:`ExperimentController.set_stim_db`, stimuli are prepared again
+        the next time they are loaded.
+        """
+        if not isinstance(stimuli, dict):
+            raise TypeError('stimuli must be a dict, got {0}'
+                            ''.format(type(stimuli)))
+        for name in stimuli:
+            if not isinstance(name, string_types):
+                raise TypeError('stimulus names must be strings, got {0}'
+                                ''.format(type(name)))
+        if max_bytes is not None:
+            if max_bytes < 0:
+                raise ValueError('max_bytes must be non-negative, got {0}'
+                                 ''.format(max_bytes))
+            self._stim_max_bytes = (None if np.isinf(max_bytes)
+                                    else int(max_bytes))
+        for name, samples in stimuli.items():
+            self._discard_prepared(name)
+            self._stim_bank[name] = (samples, None)
+            try:
+                self._get_prepared(name)
+            except Exception:
+                del self._stim_bank[name]
+                raise
+        self._trim_prepared()
+        logger.info('Expyfun: Preloaded {0} stimuli ({1:0.1f} MB)'
+                    ''.format(len(stimuli), self._stim_nbytes / 1e6))
+        return self._stim_nbytes
+
+    def _get_prepared(self, name):
+        """Get a prepared buffer (and its length), preparing if necessary"""
+        if name not in self._stim_bank:
+            raise KeyError('Stimulus "{0}" has not been preloaded, use '
+                           'ec.preload_stimuli first'.format(name))
+        samples, n_samples = self._stim_bank[name]
+        prep = self._stim_prepared.pop(name, None)
+        if prep is None or prep[2] != self._stim_scaler:
+            if prep is not None:
+                self._stim_nbytes -= prep[1]
+            validated = self._validate_audio(samples, self._stim_scaler)
+            n_samples = validated.size
+            self._stim_bank[name] = (samples, n_samples)
+            buf, nbytes = self._ac._prepare_buffer(validated)
+            del validated
+            prep = (buf, nbytes, self._stim_scaler)
+            self._stim_nbytes += nbytes
+            self._stim_prepared[name] = prep  # most recently used goes last
+            self._trim_prepared(keep=name)
+        else:
+            self._stim_prepared[name] = prep
+        return prep[0], n_samples
+
+    def _discard_prepared(self, name):
+        prep = self._stim_prepared.pop(name, None)
+        if prep is not None:
+            self._stim_nbytes -= prep[1]
+
+    def _trim_prepared(self, keep=None):
+        """Discard least recently used buffers to stay under the limit"""
+        if self._stim_max_bytes is None:
+            return
+        while self._stim_nbytes > self._stim_max_bytes:
+            name = next(iter(self._stim_prepared))  # least recently used
+            if name == keep:
+                break
+            self._discard_prepared(name)
 
     def play(self):
         """Start audio playback
@@ -1407,9 +1680,16 @@ class ExperimentController(object):
         """
         if self._playing:
             raise RuntimeError('Previous audio must be stopped before playing')
+        # the onset trigger must not end up in (or behind) a trial ID
+        if self._ttl_scheduler is not None:
+            self._ttl_scheduler.wait_idle()
         self._ac.play()
+        self._play_time = self._master_clock()
         logger.debug('Expyfun: started audio')
-        self.write_data_line('play')
+        self.write_data_line('play', timestamp=self._play_time)
+        for ii, onset in enumerate(self._queue_onsets):
+            self.write_data_line('play_queued', ii + 1,
+                                 self._play_time + onset)
 
     @property
     def _playing(self):
@@ -1428,6 +1708,7 @@ class ExperimentController(object):
         """
         if self._ac is not None:  # need to check b/c used in __exit__
             self._ac.stop()
+        self._play_time = None
         self.write_data_line('stop')
         logger.exp('Expyfun: Audio stopped and reset.')
 
@@ -1463,60 +1744,58 @@ class ExperimentController(object):
         exponent = (-(_get_dev_db(self.audio_type) - desired_db) / 20.0)
         return (10 ** exponent) / float(orig_rms)
 
-    def _validate_audio(self, samples):
+    def _validate_audio(self, samples, scale=1.):
         """Converts audio sample data to the required format.
 
         Parameters
         ----------
         samples : list | array
             The audio samples.  Mono sounds will be converted to stereo.
+        scale : float
+            Scale factor to apply to the samples.
 
         Returns
         -------
         samples : numpy.array(dtype='float32')
-            The correctly formatted audio samples. Will be a copy of
-            the original samples.
+            The correctly formatted audio samples, shape (n_samples, 2),
+            scaled by ``scale``. Will be a copy of the original samples.
         """
-        # check data type
-        samples = np.asarray(samples, dtype=np.float32)
+        # check data type, shape and dimensions (these do not copy float32
+        # data, mono sounds stay mono until the final copy below)
+        samples = _fix_audio_dims(np.asarray(samples, dtype=np.float32))
 
         # check values
-        if np.max(np.abs(samples)) > 1:
+        if samples.max() > 1 or samples.min() < -1:
             raise ValueError('Sound data exceeds +/- 1.')
             # samples /= np.max(np.abs(samples),axis=0)
 
-        # check shape and dimensions, make stereo
-        samples = _fix_audio_dims(samples, 2).T
-
         # This limit is currently set by the TDT SerialBuf objects
         # (per channel), it sets the limit on our stimulus durations...
         if np.isclose(self.stim_fs, 24414, atol=1):
-            max_samples = 4000000 - 1
-            if samples.shape[0] > max_samples:
-                raise RuntimeError('Sample too long {0} > {1}'
-                                   ''.format(samples.shape[0], max_samples))
+            if samples.shape[1] > _MAX_SAMPLES:
+                raise RuntimeError('Sample too long {0} > {1}, consider using '
+                                   'load_stream'.format(samples.shape[1],
+                                                        _MAX_SAMPLES))
 
         # resample if needed
         if self._fs_mismatch and not self._suppress_resamp:
-            logger.warning('Expyfun: Resampling {} seconds of audio'
-                           ''.format(round(len(samples) / self.stim_fs), 2))
-            from mne.filter import resample
-            samples = resample(samples, self.fs, self.stim_fs, axis=0)
+            samples = self._resample(samples)
 
         # check RMS
         if self._check_rms is not None:
-            chans = [samples[:, x] for x in range(samples.shape[1])]
             if self._check_rms == 'wholefile':
-                chan_rms = [np.sqrt(np.mean(x ** 2)) for x in chans]
-                max_rms = max(chan_rms)
+                max_rms = max(np.sqrt(np.dot(x, x) / len(x)) for x in samples)
             else:  # 'windowed'
                 win_length = int(self.fs * 0.01)  # 10ms running window
-                chan_rms = [running_rms(x, win_length) for x in chans]
-                max_rms = max([max(x) for x in chan_rms])
+                # no need to look further once we know it's too loud
+                max_rms = _max_running_rms(samples, win_length,
+                                           2 * self._stim_rms)
             if max_rms > 2 * self._stim_rms:
-                warn_string = ('Expyfun: Stimulus max RMS ({}) exceeds stated '
-                               'RMS ({}) by more than 6 dB.'
-                               ''.format(max_rms, self._stim_rms))
+                # the windowed check stops at the first window that is too loud
+                at_least = 'at least ' if self._check_rms == 'windowed' else ''
+                warn_string = ('Expyfun: Stimulus max RMS ({}{}) exceeds '
+                               'stated RMS ({}) by more than 6 dB.'
+                               ''.format(at_least, max_rms, self._stim_rms))
                 logger.warning(warn_string)
                 warnings.warn(warn_string)
             elif max_rms < 0.5 * self._stim_rms:
@@ -1525,9 +1804,30 @@ class ExperimentController(object):
                                ''.format(max_rms, self._stim_rms))
                 logger.warning(warn_string)
 
-        # this will create a copy, so we can modify inplace later!
-        samples = np.array(samples, np.float32)
-        return samples
+        # a single pass to copy, scale, and make stereo (by broadcasting), so
+        # we can modify inplace later!
+        out = np.empty((samples.shape[1], 2), np.float32)
+        np.multiply(samples.T, scale, out=out)
+        return out
+
+    def _resample(self, samples):
+        """Resample (n_ch, n_samples) audio to the device rate"""
+        if self._resample_cache is not None:
+            samples = np.ascontiguousarray(samples)
+            key = (hashlib.sha1(samples).hexdigest(), samples.shape)
+            if key in self._resample_cache:
+                logger.info('Expyfun: Using cached resampled audio')
+                return self._resample_cache[key]
+        # the mismatch itself was warned about on init
+        logger.info('Expyfun: Resampling {} seconds of audio'
+                    ''.format(round(samples.shape[1] / self.stim_fs, 2)))
+        from .stimuli._resample import resample
+        out = resample(samples, self.fs, self.stim_fs, axis=1)
+        out = out.astype(np.float32)
+        if self._resample_cache is not None:
+            out.flags.writeable = False  # shared by all loads of the stimulus
+            self._resample_cache[key] = out
+        return out
 
     def set_rms_checking(self, check_rms):
         """Set the RMS checking flag.
@@ -1562,7 +1862,7 @@ class ExperimentController(object):
     @property
     def data_fname(self):
         """Date filename"""
-        return self._data_file.name
+        return self._data_fname
 
     def get_time(self):
         """Return current master clock time
@@ -1589,14 +1889,14 @@ class ExperimentController(object):
 
         Notes
         -----
-        Writing a data line does not cause the file to be flushed.
+        Writing a data line does not cause the file to be flushed. With
+        ``data_writer='thread'``, the line is only guaranteed to be in the
+        file after the next flush (e.g., via `trial_ok` or `flush`).
         """
         if timestamp is None:
             timestamp = self._master_clock()
-        ll = '\t'.join(_sanitize(x) for x in [timestamp, event_type,
-                                              value]) + '\n'
-        if self._data_file is not None and not self._data_file.closed:
-            self._data_file.write(ll)
+        if self._data_writer is not None:
+            self._data_writer.write(timestamp, event_type, value)
 
     def _get_time_correction(self, clock_type):
         """Clock correction (sec) for different devices (screen, bbox, etc.)
@@ -1748,7 +2048,8 @@ class ExperimentController(object):
             raise ValueError('All values of id must be 0 or 1')
         id_ = 2 ** (id_.astype(int) + 2)  # 4's and 8's
         # Note: we no longer put 8, 8 on ends
-        self._stamp_ttl_triggers(id_, delay=delay, wait_for_last=wait_for_last)
+        return self._stamp_ttl_triggers(id_, delay=delay,
+                                        wait_for_last=wait_for_last)
 
     def stamp_triggers(self, ids, check='binary', wait_for_last=True):
         """Stamp binary values
@@ -1763,11 +2064,21 @@ class ExperimentController(object):
             1 and 15.
         wait_for_last : bool
             If True, wait for last trigger to be stamped before returning.
+            Otherwise, return immediately, and stamp the triggers from a
+            background thread (with the TDT, which can only be used from
+            one thread, return right after stamping the last trigger).
+
+        Returns
+        -------
+        done : instance of threading.Event
+            Set once the last trigger has been stamped.
 
         Notes
         -----
         This may be (nearly) instantaneous, or take a while, depending
-        on the type of triggering (TDT or parallel).
+        on the type of triggering (TDT or parallel). Triggers are stamped
+        at fixed intervals from their first one (so delays do not add up),
+        and the times they were actually stamped at are logged.
 
         If absolute minimal latency is required, consider using the
         private function _stamp_ttl_triggers (for advanced use only,
@@ -1787,14 +2098,14 @@ class ExperimentController(object):
             if not all(id_ in _vals for id_ in ids):
                 raise ValueError('with check="binary", ids must all be '
                                  '1, 2, 4, or 8: {0}'.format(ids))
-        self._stamp_ttl_triggers(ids, wait_for_last=wait_for_last)
+        return self._stamp_ttl_triggers(ids, wait_for_last=wait_for_last)
 
     def flush(self):
         """Flush logs and data files
         """
         flush_logger()
-        if self._data_file is not None and not self._data_file.closed:
-            self._data_file.flush()
+        if self._data_writer is not None:
+            self._data_writer.flush()
 
     def close(self):
         """Close all connections in experiment controller.
@@ -7,7 +7,9 @@
 
 import sys
 import os
+import os.path as op
 import warnings
+from collections import OrderedDict
 
 import numpy as np
 
@@ -28,14 +30,17 @@ pyglet.options['audio'] = _driver
 try:
     from pyglet.media import Player, AudioFormat, SourceGroup  # noqa
     try:
-        from pyglet.media import StaticMemorySource
+        from pyglet.media import StaticMemorySource, StreamingSource
+        from pyglet.media import AudioData
     except ImportError:
-        from pyglet.media.sources.base import StaticMemorySource  # noqa
+        from pyglet.media.sources.base import (StaticMemorySource,  # noqa
+                                               StreamingSource, AudioData)
 except Exception as exp:
     warnings.warn('Pyglet could not be imported:\n%s' % exp)
     Player = AudioFormat = SourceGroup = StaticMemorySource = object
+    StreamingSource = AudioData = object
 
-from ._utils import logger, flush_logger  # noqa
+from ._utils import logger, flush_logger, get_config  # noqa
 
 
 def _check_pyglet_audio():
@@ -49,13 +54,40 @@ class SoundPlayer(Player):
         assert AudioFormat is not None
         super(SoundPlayer, self).__init__()
         _check_pyglet_audio()
-        sms = _as_static(data, fs)
+        self.load_source(data, fs, loop)
+
+    def load_source(self, data, fs, loop=False):
+        """Replace whatever is loaded (or playing), so the player can be
+        reused"""
+        if isinstance(data, (StaticMemorySourceFixed, WavStreamSource)):
+            sms = data
+            sms.seek(0.)
+        else:
+            sms = _as_static(data, fs)
+        self.delete()  # drop the old sources and the driver's player
+        self._playing = False
+        self._paused_time = 0.
         group = SourceGroup(sms.audio_format, None)
         group.loop = bool(loop)
         group.queue(sms)
         self.queue(group)
+        self._ec_group = group
+        self._ec_sources = [sms]
         self._ec_duration = sms._duration
 
+    def append_source(self, source):
+        """Queue a converted source to play right after the current ones
+
+        Returns the onset of the source (in seconds) relative to the start of
+        playback.
+        """
+        source.seek(0.)
+        self._ec_group.queue(source)
+        self._ec_sources.append(source)
+        onset = self._ec_duration
+        self._ec_duration += source._duration
+        return onset
+
     def stop(self):
         self.pause()
         self.seek(0.)
@@ -64,8 +96,65 @@ class SoundPlayer(Player):
     def playing(self):
         """Pyglet has this property, but it doesn't notice when it's finished
         on its own..."""
-        return (super(SoundPlayer, self).playing and not
-                np.isclose(self.time, self._ec_duration))
+        playing = super(SoundPlayer, self).playing
+        if playing:
+            # unlike self.time, the time of the audio player is not relative
+            # to the current source (which matters for appended sources)
+            time = None
+            if self._audio_player is not None:
+                time = self._audio_player.get_time()
+            time = self.time if time is None else time
+            playing = not np.isclose(time, self._ec_duration)
+        return playing
+
+
+class _PlayerPool(object):
+    """Recycle players, and cache converted sounds, for quick one-off playback
+
+    Players are reused once they have finished (or been stopped). When all
+    ``n_players`` are busy, the one started longest ago is taken over.
+    Converted sounds are kept for the ``n_sounds`` most recently used keys.
+    """
+    def __init__(self, n_players=8, n_sounds=32):
+        self.n_players = n_players
+        self.n_sounds = n_sounds
+        self._players = list()  # least recently started first
+        self._sounds = OrderedDict()  # key -> (bytes, audio_format), LRU
+
+    def get_source(self, key, make_data, fs):
+        """Get a new source for the key, calling ``make_data()`` to get the
+        data to convert only if it is not cached"""
+        if key in self._sounds:
+            self._sounds[key] = self._sounds.pop(key)  # most recently used
+        else:
+            sms = _as_static(make_data(), fs)
+            self._sounds[key] = (sms._file.getvalue(), sms.audio_format)
+            while len(self._sounds) > self.n_sounds:
+                self._sounds.popitem(last=False)
+        # each source has its own read position, but shares the bytes
+        return StaticMemorySourceFixed(*self._sounds[key])
+
+    def get_player(self, source, fs):
+        """Get a (free) player with the source loaded"""
+        for player in self._players:
+            if not player.playing:
+                break
+        else:
+            player = self._players[0] if \
+                len(self._players) >= self.n_players else None
+        if player is None:
+            player = SoundPlayer(source, fs)
+        else:
+            self._players.remove(player)
+            player.load_source(source, fs)
+        self._players.append(player)
+        return player
+
+    def clear(self):
+        for player in self._players:
+            player.delete()
+        self._players = list()
+        self._sounds.clear()
 
 
 class PygletSoundController(object):
@@ -74,28 +163,36 @@ class PygletSoundController(object):
         logger.info('Expyfun: Setting up Pyglet audio')
         assert AudioFormat is not None
         self.fs = stim_fs
-
-        # Need to generate at RMS=1 to match TDT circuit
-        noise = np.random.normal(0, 1.0, int(self.fs * 15.))  # 15 secs
-
-        # Low-pass if necessary
-        if stim_fs < self.fs:
-            # note we can use cheap DFT method here b/c
-            # circular convolution won't matter for AWGN (yay!)
-            freqs = np.fft.rfftfreq(len(noise), 1. / self.fs)
-            noise = np.fft.rfft(noise)
-            noise[np.abs(freqs) > stim_fs / 2.] = 0.0
-            noise = np.fft.irfft(noise)
-
-        # ensure true RMS of 1.0 (DFT method also lowers RMS, compensate here)
-        noise = noise / np.sqrt(np.mean(noise * noise))
-        self.noise_array = np.array((noise, -1.0 * noise))
-        self.noise = SoundPlayer(self.noise_array, self.fs, loop=True)
+        # the noise is only made once it's needed (see noise_array and noise)
+        self._noise_array = None
+        self._noise = None
         self._noise_playing = False
+        self._noise_level = 1.  # current level
+        self._noise_player_level = None  # level the noise player was made with
         self.audio = SoundPlayer(np.zeros((2, 1)), self.fs)
         self.ec = ec
         flush_logger()
 
+    @property
+    def noise_array(self):
+        """The (stereo) masker noise, generated at RMS=1"""
+        if self._noise_array is None:
+            seed = get_config('NOISE_SEED', None)
+            noise = _get_noise(self.fs, _NOISE_DUR,
+                               None if seed is None else int(seed),
+                               get_config('NOISE_CACHE_DIR', None))
+            self._noise_array = np.array((noise, -1.0 * noise))
+        return self._noise_array
+
+    @property
+    def noise(self):
+        """The looping noise player"""
+        if self._noise is None:
+            self._noise = SoundPlayer(self.noise_array * self._noise_level,
+                                      self.fs, loop=True)
+            self._noise_player_level = self._noise_level
+        return self._noise
+
     def start_noise(self):
         if not self._noise_playing:
             self.noise.play()
@@ -107,8 +204,22 @@ class PygletSoundController(object):
             self._noise_playing = False
 
     def load_buffer(self, samples):
+        self._load_prepared(self._prepare_buffer(samples)[0])
+
+    def _prepare_buffer(self, samples):
+        """Convert samples to a source, return it and its size in bytes"""
+        source = _as_static(samples.T, self.fs)
+        return source, source._max_offset
+
+    def _load_prepared(self, source):
         self.audio.delete()
-        self.audio = SoundPlayer(samples.T, self.fs)
+        self.audio = SoundPlayer(_new_reader(source), self.fs)
+
+    def _queue_prepared(self, source):
+        return self.audio.append_source(_new_reader(source))
+
+    def load_stream(self, data, scale):
+        self._load_prepared(WavStreamSource(data, self.fs, scale))
 
     @property
     def playing(self):
@@ -119,42 +230,175 @@ class PygletSoundController(object):
         self.ec._stamp_ttl_triggers([1])
 
     def stop(self):
-        self.audio.stop()
+        sources = self.audio._ec_sources
+        if len(sources) > 1:
+            # played sources are dropped from the queue, so start over
+            self._load_prepared(sources[0])
+            for source in sources[1:]:
+                self._queue_prepared(source)
+        else:
+            self.audio.stop()
 
     def set_noise_level(self, level):
-        new_noise = SoundPlayer(self.noise_array * level, self.fs, loop=True)
-        if self._noise_playing:
-            self.stop_noise()
-            self.noise.delete()
-            self.noise = new_noise
+        self._noise_level = level
+        if self._noise is None:  # it will be made at this level
+            return
+        # Lower levels are just a gain on the existing player (no gap in the
+        # noise, no re-quantization). Higher levels would need amplification
+        # (which not all drivers support), so make a new player for those.
+        if level <= self._noise_player_level:
+            self._noise.volume = (level / self._noise_player_level
+                                  if self._noise_player_level > 0 else 0.)
+            return
+        playing = self._noise_playing
+        self.stop_noise()
+        self._noise.delete()
+        self._noise = None
+        if playing:
             self.start_noise()
-        else:
-            self.noise = new_noise
 
     def halt(self):
         self.stop()
         self.stop_noise()
         # cleanup pyglet instances
         self.audio.delete()
-        self.noise.delete()
+        if self._noise is not None:
+            self._noise.delete()
+
+
+# duration of the (looped) masker noise
+_NOISE_DUR = 15.
+
+
+def _get_noise(fs, dur, seed=None, cache_dir=None):
+    """Make masker noise with a true RMS of 1
+
+    If ``cache_dir`` is given, the noise is loaded from (or saved to) a file
+    there, keyed by the sample rate, duration, and seed (which defaults to
+    0 in that case).
+    """
+    if cache_dir is not None:
+        seed = 0 if seed is None else seed
+        fname = op.join(cache_dir, 'expyfun_noise_{0!r}_{1!r}_{2}.npy'
+                        ''.format(float(fs), float(dur), seed))
+        if op.isfile(fname):
+            try:
+                noise = np.load(fname)
+            except Exception as exp:  # e.g., partially written
+                logger.warning('Expyfun: Could not load cached noise {0}: '
+                               '{1}'.format(fname, exp))
+            else:
+                if noise.shape == (int(fs * dur),):
+                    return noise
+    rng = np.random.RandomState(seed)
+    noise = rng.normal(0, 1.0, int(fs * dur))
+    noise /= np.sqrt(np.mean(noise * noise))  # ensure true RMS of 1.0
+    if cache_dir is not None:
+        if not op.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # write then rename, so the file is never seen partially written
+        tmp_fname = fname + '.{0}.tmp'.format(os.getpid())
+        with open(tmp_fname, 'wb') as fid:
+            np.save(fid, noise)
+        try:
+            os.rename(tmp_fname, fname)
+        except OSError:  # Windows, if another process got there first
+            os.remove(tmp_fname)
+    return noise
+
+
+# number of samples to quantize at a time in _as_static
+_QUANT_BLOCK = 2 ** 16
 
 
 def _as_static(data, fs):
     """Helper to get data into the Pyglet audio format"""
     fs = int(fs)
+    data = np.asarray(data)
     if data.ndim not in (1, 2):
         raise ValueError('Data must have one or two dimensions')
     n_ch = data.shape[0] if data.ndim == 2 else 1
     audio_format = AudioFormat(channels=n_ch, sample_size=16,
                                sample_rate=fs)
-    data = data.T.ravel('C')
-    data[data < -1] = -1
-    data[data > 1] = 1
-    data = (data * (2 ** 15)).astype('int16').tostring()
-    return StaticMemorySourceFixed(data, audio_format)
+    # clip and quantize blockwise (interleaving the channels), so the only
+    # full-size allocations are the int16 buffer and the bytes
+    data = data.T
+    dtype = data.dtype if data.dtype.kind == 'f' else np.float64
+    out = np.empty(data.shape, np.int16)
+    tmp = np.empty((min(len(data), _QUANT_BLOCK),) + data.shape[1:], dtype)
+    for start in range(0, len(data), _QUANT_BLOCK):
+        block = data[start:start + _QUANT_BLOCK]
+        this_tmp = tmp[:len(block)]
+        np.clip(block, -1, 1, out=this_tmp)
+        this_tmp *= 2 ** 15
+        out[start:start + len(block)] = this_tmp
+    return StaticMemorySourceFixed(out.tobytes(), audio_format)
+
+
+def _new_reader(source):
+    """Get a source with its own read position over the same data
+
+    Prepared sources can be loaded (or queued) several times, and each use
+    must read from the start.
+    """
+    if isinstance(source, StaticMemorySourceFixed):
+        source = StaticMemorySourceFixed(source._file.getvalue(),
+                                         source.audio_format)
+    return source
 
 
 class StaticMemorySourceFixed(StaticMemorySource):
     """Stupid class to fix old Pyglet bug"""
     def _get_queue_source(self):
         return self
+
+
+class WavStreamSource(StreamingSource):
+    """Stream (memory-mapped) WAV data, scaling and quantizing on the fly
+
+    Parameters
+    ----------
+    data : array, shape (n_samples,) or (n_samples, n_channels)
+        The WAV data (e.g., from ``scipy.io.wavfile.read(..., mmap=True)``),
+        mono or stereo. Mono data is played on both channels.
+    fs : float
+        The sample rate.
+    scale : float
+        Scale factor to apply (after normalizing integer data to +/-1).
+    """
+    def __init__(self, data, fs, scale):
+        from .io._wav import _get_dtype_norm
+        self._data = data.reshape(len(data), -1)
+        assert self._data.shape[1] in (1, 2)
+        self._norm = _get_dtype_norm(data.dtype)
+        self._scale = np.float32(scale)
+        self._fs = float(fs)
+        self.audio_format = AudioFormat(channels=2, sample_size=16,
+                                        sample_rate=int(fs))
+        self._duration = len(data) / self._fs
+        self._pos = 0
+
+    def _get_queue_source(self):
+        return self  # can be queued again (e.g., after a stop)
+
+    def seek(self, timestamp):
+        self._pos = int(min(max(round(timestamp * self._fs), 0),
+                            len(self._data)))
+
+    def get_audio_data(self, bytes):
+        n = max(bytes // self.audio_format.bytes_per_sample, 1)
+        block = self._data[self._pos:self._pos + n]
+        if len(block) == 0:
+            return None
+        timestamp = self._pos / self._fs
+        self._pos += len(block)
+        # same operations (and precision) as read_wav + load_buffer
+        tmp = (block / float(self._norm)).astype(np.float32)
+        tmp *= self._scale
+        np.clip(tmp, -1, 1, out=tmp)
+        tmp *= 2 ** 15
+        out = np.empty((len(block), 2), np.int16)
+        out[:] = tmp  # broadcasts mono to stereo
+        data = out.tobytes()
+        return AudioData(data, len(data), timestamp, len(block) / self._fs,
+                         [])
@@ -11,10 +11,28 @@ import numpy as np
 from os import path as op
 from functools import partial
 from copy import deepcopy
+from threading import Event, Lock, RLock, Thread
 import warnings
 
-from ._utils import get_config, wait_secs, logger, ZeroClock
+from ._utils import get_config, logger, ZeroClock
 from ._input_controllers import Keyboard
+from ._trigger_controllers import _TriggerScheduler
+
+# The TDT SerialBuf objects limit the number of samples (per channel)
+_MAX_SAMPLES = 4000000 - 1
+
+# samples (per channel) written per call when uploading in the background
+_UPLOAD_CHUNK = 2 ** 17
+
+# tags whose reads are coalesced: a read within this time (in sec) of the
+# previous one returns the same value
+_TAG_MAX_AGE = dict(playing=0.001, npressabs=0.001)
+
+# streaming: size of the circular buffer and of each refill (in samples per
+# channel), and how often to check the playback position (in sec)
+_RING_SAMPLES = 2 ** 20
+_RING_CHUNK = 2 ** 16
+_RING_POLL = 0.01
 
 
 def _dummy_fun(self, name, ret, *args, **kwargs):
@@ -27,39 +45,248 @@ class DummyRPcoX(object):
     def __init__(self, model, interface):
         self.model = model
         self.interface = interface
-        names = ['LoadCOF', 'ClearCOF', 'Run', 'ZeroTag', 'SetTagVal',
-                 'GetSFreq', 'Halt']
-        returns = [True, True, True, True, True,
-                   24414.0125, True]
+        names = ['LoadCOF', 'ClearCOF', 'Run', 'ZeroTag', 'GetSFreq', 'Halt']
+        returns = [True, True, True, True, 24414.0125, True]
         for name, ret in zip(names, returns):
             setattr(self, name, partial(_dummy_fun, self, name, ret))
         self._clock = ZeroClock()
         self._stim_dur = 0
         self._play_start = 0
+        self._cursor_start = None  # time the playback cursor started moving
+        self._presses = list()  # (time in samples, value) of button presses
+        self.latency = 0.  # time each WriteTagVEX call takes (to simulate)
+
+    def SetTagVal(self, name, val):
+        if name == 'nsamples':  # the first sample is always zero
+            self._stim_dur = (val - 1) / self.GetSFreq()
+        return _dummy_fun(self, 'SetTagVal', True, name, val)
+
+    def GetTagType(self, name):
+        return ord('I') if name in ('bufpos', 'npressabs') else 0
 
     def WriteTagVEX(self, name, offset, kind, data):
-        if name == 'datainleft':
-            self._stim_dur = len(data) / self.GetSFreq()
+        if self.latency:
+            time.sleep(self.latency)
         return True
 
     def SoftTrg(self, trignum):
         if trignum == 1:
             self._play_start = time.time()
+            self._cursor_start = self._play_start
         elif trignum == 2:
             self._play_start -= self._stim_dur
+            self._cursor_start = None
+        elif trignum == 7:
+            self._presses = list()
         return True
 
+    def _press(self, button):
+        """Simulate a button box press (buttons are numbered from 1)"""
+        self._presses.append((int(self.GetTagVal('masterclock') *
+                                  self.GetSFreq()), 2 ** (int(button) - 1)))
+
+    def ReadTagVEX(self, name, offset, n, src_kind, dst_kind, n_chan):
+        if name == 'presstimesabs':
+            idx = 0
+        elif name == 'pressvalsabs':  # indexed from one
+            idx, offset = 1, offset - 1
+        else:
+            raise ValueError('unknown tag "{0}"'.format(name))
+        return [[p[idx] for p in self._presses[offset:offset + n]]]
+
     def GetTagVal(self, name):
         if name == 'masterclock':
             return self._clock.get_time()
         elif name == 'npressabs':
-            return 0
+            return len(self._presses)
         elif name == 'playing':
             return (time.time() - self._play_start < self._stim_dur)
+        elif name == 'bufpos':  # samples played since the start
+            if self._cursor_start is None:
+                return 0
+            pos = (time.time() - self._cursor_start) * self.GetSFreq()
+            return int(min(pos, self._stim_dur * self.GetSFreq()))
         else:
             raise ValueError('unknown tag "{0}"'.format(name))
 
 
+class _LockedRPcoX(object):
+    """Make the calls to an RPcoX object from several threads one at a time
+
+    Only objects that are not COM objects (i.e., the dummy) may be used from
+    other threads (``threads_ok``): the RPcoX object of a real TDT is an
+    ActiveX (COM) object that lives in the single-threaded apartment of the
+    thread that made it. Calls from other threads would have to be carried
+    out by that thread, which does not process them while it waits (e.g.,
+    for those threads).
+    """
+    def __init__(self, rpcox):
+        self._rpcox = rpcox
+        self._lock = RLock()
+        self.threads_ok = not hasattr(rpcox, '_oleobj_')
+
+    def __getattr__(self, name):
+        attr = getattr(self._rpcox, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+def _write_buffer(rpcox, data, offset, chunk=None, cancel=None):
+    """Write data to the buffers starting at sample offset, then make
+    playback stop at its end (in chunks of samples, if given)"""
+    n_samples = data.shape[1]
+    chunk = max(n_samples, 1) if chunk is None else chunk
+    for start in range(0, max(n_samples, 1), chunk):
+        if cancel is not None and cancel.is_set():
+            return
+        # Leave the first sample zero so on reset the output goes to zero
+        for name, this_data in zip(('datainleft', 'datainright'), data):
+            rpcox.WriteTagVEX(name, offset + start + 1, 'F32',
+                              this_data[start:start + chunk])
+    rpcox.SetTagVal('nsamples', offset + n_samples + 1)
+
+
+class _BufferUpload(object):
+    """Write data to the TDT buffers in chunks from a background thread
+
+    ``done()`` tells whether the upload has finished, and ``wait()`` waits
+    for it to finish, raising any error that occurred.
+    """
+    def __init__(self, rpcox, data, offset):
+        self._error = None
+        self._cancel = Event()
+        self._done = Event()
+        self._thread = Thread(target=self._run, args=(rpcox, data, offset),
+                              name='expyfun-tdt-upload')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, rpcox, data, offset):
+        try:
+            _write_buffer(rpcox, data, offset, _UPLOAD_CHUNK, self._cancel)
+        except Exception as exp:
+            self._error = exp
+        finally:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+
+
+class _RingStream(object):
+    """Stream (memory-mapped) WAV data through a circular buffer on the TDT
+
+    The data are scaled and converted in chunks. Before playback, the ring
+    is filled from the start of the data in the background (``wait()``
+    waits for that); during playback, a thread polls the playback position
+    and overwrites the samples that have been played with the next ones.
+    """
+    def __init__(self, rpcox, data, scale):
+        from .io._wav import _get_dtype_norm
+        self._rpcox = rpcox
+        self._data = data.reshape(len(data), -1)
+        self._norm = _get_dtype_norm(data.dtype)
+        self._scale = np.float32(scale)
+        self.n_samples = len(data)
+        self.n_underruns = 0
+        self._stop = Event()
+        self._thread = None
+        self._filler = None
+        self._error = None
+        self._rpcox.SetTagVal('ringsize', _RING_SAMPLES)
+        self._rpcox.SetTagVal('nsamples', self.n_samples + 1)
+        self.rewind()
+
+    def _convert(self, start, stop):
+        """Get (stereo) samples as written by read_wav + load_buffer"""
+        block = (self._data[start:stop] / float(self._norm)).astype(np.float32)
+        block *= self._scale
+        np.clip(block, -1, 1, out=block)
+        out = np.empty((2, len(block)), np.float32)
+        out[:] = block.T  # broadcasts mono to stereo
+        return out
+
+    def _fill(self, stop):
+        """Write the samples up to stop, in chunks that do not wrap"""
+        while self._written < stop and not self._stop.is_set():
+            offset = self._written % _RING_SAMPLES
+            n = min(stop - self._written, _RING_CHUNK, _RING_SAMPLES - offset)
+            data = self._convert(self._written, self._written + n)
+            # Leave the first sample zero so on reset the output goes to zero
+            for name, this_data in zip(('datainleft', 'datainright'), data):
+                self._rpcox.WriteTagVEX(name, offset + 1, 'F32', this_data)
+            self._written += n
+
+    def _fill_ring(self):
+        try:
+            self._fill(min(self.n_samples, _RING_SAMPLES))
+        except Exception as exp:
+            self._error = exp
+
+    def rewind(self):
+        """Stop refilling, and fill the ring from the start of the data"""
+        self.stop()
+        self._written = 0
+        self._error = None
+        self._stop.clear()
+        self._filler = Thread(target=self._fill_ring,
+                              name='expyfun-tdt-stream-fill')
+        self._filler.daemon = True
+        self._filler.start()
+
+    def wait(self):
+        """Wait for the ring to be filled, raising any error from filling"""
+        if self._filler is not None:
+            self._filler.join()
+            self._filler = None
+        if self._error is not None:
+            raise self._error
+
+    def start(self):
+        """Start refilling during playback"""
+        self.wait()
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='expyfun-tdt-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in (self._filler, self._thread):
+            if thread is not None:
+                thread.join()
+        self._filler = self._thread = None
+
+    def _run(self):
+        underrun = False
+        while self._written < self.n_samples and not self._stop.is_set():
+            pos = int(self._rpcox.GetTagVal('bufpos'))
+            if pos > self._written:  # played samples that were not written
+                if not underrun:
+                    self.n_underruns += 1
+                    logger.warning('Expyfun: TDT stream underrun at sample '
+                                   '{0} of {1}'.format(self._written,
+                                                       self.n_samples))
+                underrun = True
+            else:
+                underrun = False
+            self._fill(min(pos + _RING_SAMPLES, self.n_samples))
+            self._stop.wait(_RING_POLL)
+
+
 class TDTController(Keyboard):
     """Interface for TDT audio output, stamping, and responses
 
@@ -84,6 +311,12 @@ class TDTController(Keyboard):
             * 'TDT_DELAY': the delay (in ms) for the circuit (default: '0').
             * 'TDT_TRIG_DELAY': additional delay for the triggers
               (default: '0').
+            * 'TDT_UPLOAD': 'sync' (default) to write audio to the TDT
+              before loading returns, or 'async' to write it in chunks from
+              a background thread, with playback waiting for it to finish.
+              'async' only works with the dummy TDT: a real TDT can only be
+              used from the thread that connected to it, so its uploads are
+              always done before loading returns.
 
         Note that the defaults are overridden on individual machines by
         the configuration file.
@@ -95,7 +328,7 @@ class TDTController(Keyboard):
     """
     def __init__(self, tdt_params):
         legal_keys = ['TYPE', 'TDT_MODEL', 'TDT_CIRCUIT_PATH', 'TDT_INTERFACE',
-                      'TDT_DELAY', 'TDT_TRIG_DELAY']
+                      'TDT_DELAY', 'TDT_TRIG_DELAY', 'TDT_UPLOAD']
         tdt_params = dict(TYPE='tdt') if tdt_params is None else tdt_params
         tdt_params = deepcopy(tdt_params)
         if not isinstance(tdt_params, dict):
@@ -106,7 +339,7 @@ class TDTController(Keyboard):
                              '{0}'.format(tdt_params['TYPE']))
         # Set sensible defaults for values that are not passed
         defaults = dict(TDT_MODEL='dummy', TDT_DELAY='0', TDT_TRIG_DELAY='0',
-                        TYPE='tdt')  # if not listed -> None
+                        TDT_UPLOAD='sync', TYPE='tdt')  # if not listed -> None
         for k in legal_keys:
             tdt_params[k] = tdt_params.get(
                 k, get_config(k, defaults.get(k, None)))
@@ -114,6 +347,9 @@ class TDTController(Keyboard):
             tdt_params[key] = int(tdt_params[key])
         if tdt_params['TDT_DELAY'] < 0:
             raise ValueError('tdt_delay must be non-negative.')
+        if tdt_params['TDT_UPLOAD'] not in ('sync', 'async'):
+            raise ValueError('TDT_UPLOAD must be "sync" or "async", got '
+                             '"{0}"'.format(tdt_params['TDT_UPLOAD']))
 
         # Check keys
         for k in tdt_params.keys():
@@ -172,6 +408,17 @@ class TDTController(Keyboard):
             logger.info('Expyfun: RPcoX connection established')
         else:
             raise IOError('Problem initializing RPcoX.')
+        # uploads and streaming can use the dummy from other threads
+        self.rpcox = _LockedRPcoX(self.rpcox)
+        self._async_upload = (tdt_params['TDT_UPLOAD'] == 'async')
+        if self._async_upload and not self.rpcox.threads_ok:
+            logger.warning('Expyfun: TDT_UPLOAD="async" is not supported with '
+                           'a real TDT, uploading synchronously')
+            self._async_upload = False
+        self._upload = None
+        # triggers are always stamped from this thread
+        self._scheduler = _TriggerScheduler(self._stamp_trigger, 'TDT',
+                                            background=False)
         """
         # start zBUS (may be needed for devices other than RM1)
         self.zbus = connect_zbus(interface=interface)
@@ -199,12 +446,21 @@ class TDTController(Keyboard):
         else:
             raise SystemError('Expyfun: Problem starting TDT circuit.')
         time.sleep(0.25)
+        self._fs = float(self.rpcox.GetSFreq())
+        self._tag_stats = dict()  # name -> [number of calls, time spent]
+        self._tag_stats_lock = Lock()  # tags are also read from threads
+        self._tag_cache = dict()  # name -> (time read, value)
+        self._presses = list()  # presses read since the last clear
+        # streaming needs a circuit that plays the buffers circularly
+        self._ring_ok = self.rpcox.GetTagType('bufpos') in (ord('I'), 'I')
+        self._stream = None
         self._set_noise_corr()
         self._set_delay(tdt_params['TDT_DELAY'],
                         tdt_params['TDT_TRIG_DELAY'])
         # Set output values to zero (esp. first few)
         for tag in ('datainleft', 'datainright'):
             self.rpcox.ZeroTag(tag)
+        self._n_loaded = 0
         self.rpcox.SetTagVal('trgname', 0)
         self._used_params = tdt_params
 
@@ -227,29 +483,130 @@ class TDTController(Keyboard):
         data : np.array
             Audio data as floats scaled to (-1,+1), formatted as an Nx2 numpy
             array with dtype 'float32'.
+
+        Returns
+        -------
+        upload : object | None
+            The upload in progress (see the ``'TDT_UPLOAD'`` parameter), or
+            None if the data have been written.
+        """
+        return self._load_prepared(self._prepare_buffer(data)[0])
+
+    def _prepare_buffer(self, data):
+        """Convert audio samples to the device format
+
+        Returns the buffer (one contiguous array per channel) and its size
+        in bytes.
         """
         assert data.dtype == np.float32
-        # Leave the first sample zero so on reset the output goes to zero
-        self.rpcox.WriteTagVEX('datainleft', 1, 'F32', data[:, 0])
-        self.rpcox.WriteTagVEX('datainright', 1, 'F32', data[:, 1])
-        self.rpcox.SetTagVal('nsamples', max(data.shape[0] + 1, 1))
+        data = np.ascontiguousarray(data.T)
+        return data, data.nbytes
+
+    def _load_prepared(self, data):
+        """Load a buffer made by _prepare_buffer"""
+        self._end_stream()
+        self._wait_upload(cancel=True)  # its data are being replaced anyway
+        self._n_loaded = data.shape[1]
+        if self._async_upload:
+            self._upload = _BufferUpload(self.rpcox, data, 0)
+            return self._upload
+        _write_buffer(self.rpcox, data, 0)
+
+    def _wait_upload(self, cancel=False):
+        """Wait for the background upload (if any) to finish
+
+        A failed upload is kept (so its error is raised again) until new
+        data are loaded, so that a partially written buffer never plays.
+        """
+        upload = self._upload
+        if upload is None:
+            return
+        if cancel:  # errors do not matter for data that are discarded
+            upload.cancel()
+            upload._done.wait()
+        else:
+            if not upload.done():
+                logger.debug('Expyfun: Waiting for the TDT upload')
+            upload.wait()
+        self._upload = None
+
+    def _queue_prepared(self, data):
+        """Append a buffer made by _prepare_buffer to the loaded one
+
+        Returns the onset (in seconds) relative to the start of playback.
+        """
+        if self._stream is not None:
+            raise RuntimeError('Audio cannot be queued after a stream')
+        onset = self._n_loaded
+        n_total = onset + data.shape[1]
+        if n_total > _MAX_SAMPLES:
+            raise RuntimeError('Sample too long {0} > {1}'
+                               ''.format(n_total, _MAX_SAMPLES))
+        self._wait_upload()
+        _write_buffer(self.rpcox, data, onset)
+        self._n_loaded = n_total
+        return onset / float(self.fs)
+
+    def load_stream(self, data, scale):
+        """Stream data through a circular buffer during playback
+
+        Parameters
+        ----------
+        data : array, shape (n_samples,) or (n_samples, n_channels)
+            The (memory-mapped) mono or stereo WAV data.
+        scale : float
+            Scale factor to apply (after normalizing integer data to +/-1).
+
+        Notes
+        -----
+        This requires a circuit (``'TDT_CIRCUIT_PATH'``) that reads the
+        buffers circularly, wrapping around after the number of samples in
+        its ``ringsize`` tag, and that exposes the number of samples played
+        so far in its ``bufpos`` tag. The ring is refilled from another
+        thread, so this only works with the dummy TDT for now.
+        """
+        if not self.rpcox.threads_ok:
+            raise RuntimeError('Streaming is not supported with a real TDT '
+                               '(it can only be used from one thread)')
+        if not self._ring_ok:
+            raise RuntimeError('The TDT circuit does not support streaming '
+                               '(it has no "bufpos" tag)')
+        self._end_stream()
+        self._wait_upload(cancel=True)
+        self._stream = _RingStream(self.rpcox, data, scale)
+        self._n_loaded = self._stream.n_samples
+
+    def _end_stream(self):
+        """Stop streaming (if streaming) and go back to the usual buffer"""
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream = None
+            self.rpcox.SetTagVal('ringsize', 0)
 
     def play(self):
         """Send the soft trigger to start the ring buffer playback.
         """
-        self.rpcox.SetTagVal('trgname', 1)
-        self._trigger(1)
+        self._wait_upload()
+        if self._stream is not None:
+            self._stream.wait()  # for the ring to be filled
+        with self.rpcox._lock:  # no trigger may change trgname in between
+            self.rpcox.SetTagVal('trgname', 1)
+            self._trigger(1)
+        if self._stream is not None:
+            self._stream.start()
         logger.debug('Expyfun: Starting TDT ring buffer')
 
     @property
     def playing(self):
         """Is a sound currently playing"""
-        return bool(int(self.rpcox.GetTagVal('playing')))
+        return bool(int(self._get_tag('playing')))
 
     def stop(self):
         """Send the soft trigger to stop and reset the ring buffer playback.
         """
         self._trigger(2)
+        if self._stream is not None:
+            self._stream.rewind()  # refills in the background
         logger.debug('Expyfun: Stopping TDT audio')
 
     def start_noise(self):
@@ -292,12 +649,22 @@ class TDTController(Keyboard):
             The inter-trigger delay.
         wait_for_last : bool
             If True, wait for last trigger to be stamped before returning.
+            Otherwise, return right after stamping the last trigger (the
+            TDT triggers are stamped from the calling thread).
+
+        Returns
+        -------
+        done : instance of threading.Event
+            Set once the last trigger has been stamped.
         """
-        for ti, trig in enumerate(triggers):
+        return self._scheduler.stamp_triggers(triggers, delay,
+                                              wait_for_last).done
+
+    def _stamp_trigger(self, trig):
+        """Stamp a single trigger"""
+        with self.rpcox._lock:
             self.rpcox.SetTagVal('trgname', trig)
             self._trigger(6)
-            if ti < len(triggers) - 1 or wait_for_last:
-                wait_secs(delay)
 
     def _trigger(self, trig):
         """Wrapper for tdt.util.RPcoX.SoftTrg()
@@ -307,20 +674,59 @@ class TDTController(Keyboard):
         trigger_number : int
             Trigger number to send to TDT.
         """
+        self._tag_cache.clear()  # e.g., "playing" may have changed
         if not self.rpcox.SoftTrg(trig):
             logger.warning('SoftTrg failure for trigger: {}'.format(trig))
 
+# ################################# TAG ACCESS ################################
+    def _time_tag(self, name, fun, *args):
+        """Call an RPcoX method for a tag, keeping track of the time spent"""
+        t0 = time.time()
+        try:
+            return fun(*args)
+        finally:
+            dur = time.time() - t0
+            with self._tag_stats_lock:
+                stats = self._tag_stats.setdefault(name, [0, 0.])
+                stats[0] += 1
+                stats[1] += dur
+
+    def _get_tag(self, name):
+        """Read the value of a tag (see _TAG_MAX_AGE)"""
+        max_age = _TAG_MAX_AGE.get(name, 0.)
+        # a single lookup, as triggers (stamped from another thread) clear it
+        cached = self._tag_cache.get(name)
+        if cached is not None and time.time() - cached[0] < max_age:
+            return cached[1]
+        val = self._time_tag(name, self.rpcox.GetTagVal, name)
+        if max_age > 0:
+            self._tag_cache[name] = (time.time(), val)
+        return val
+
+    def _read_tag(self, name, offset, n):
+        """Read n I32 values from a buffer tag"""
+        return self._time_tag(name, self.rpcox.ReadTagVEX, name, offset, n,
+                              'I32', 'I32', 1)[0]
+
+    def _log_tag_stats(self):
+        with self._tag_stats_lock:
+            tag_stats = sorted(self._tag_stats.items())
+        for name, (n_calls, dur) in tag_stats:
+            logger.debug('Expyfun: TDT tag {0}: {1} calls, {2:0.3f} sec'
+                         ''.format(name, n_calls, dur))
+
 # ############################### KEYBOARD METHODS ############################
 
     def _get_timebase(self):
         """Return time since circuit was started (in seconds).
         """
-        return self.rpcox.GetTagVal('masterclock') / float(self.fs)
+        return self._get_tag('masterclock') / self.fs
 
     def _clear_events(self):
         """Clear keyboard buffers.
         """
         self._trigger(7)
+        self._presses = list()
         self._clear_keyboard_events()
 
     def _retrieve_events(self, live_keys, type='presses'):
@@ -328,21 +734,22 @@ class TDTController(Keyboard):
         """
         if type != 'presses':
             raise RuntimeError("TDT Cannot get key release events")
-        # get values from the tdt
-        press_count = int(round(self.rpcox.GetTagVal('npressabs')))
-        if press_count > 0:
+        # get values from the tdt, only reading the new presses
+        press_count = int(round(self._get_tag('npressabs')))
+        n_read = len(self._presses)
+        if press_count < n_read:  # the buffer was reset
+            self._presses, n_read = list(), 0
+        if press_count > n_read:
+            n_new = press_count - n_read
             # this one is indexed from zero
-            press_times = self.rpcox.ReadTagVEX('presstimesabs', 0,
-                                                press_count, 'I32', 'I32', 1)
+            press_times = self._read_tag('presstimesabs', n_read, n_new)
             # this one is indexed from one (silly)
-            press_vals = self.rpcox.ReadTagVEX('pressvalsabs', 1, press_count,
-                                               'I32', 'I32', 1)
-            press_times = np.array(press_times[0], float) / self.fs
-            press_vals = np.log2(np.array(press_vals[0], float)) + 1
+            press_vals = self._read_tag('pressvalsabs', n_read + 1, n_new)
+            press_times = np.array(press_times, float) / self.fs
+            press_vals = np.log2(np.array(press_vals, float)) + 1
             press_vals = [str(int(round(p))) for p in press_vals]
-            presses = [(v, t) for v, t in zip(press_vals, press_times)]
-        else:
-            presses = []
+            self._presses.extend(zip(press_vals, press_times))
+        presses = list(self._presses)
         # adds force_quit presses
         presses.extend(self._retrieve_keyboard_events([]))
         return presses
@@ -361,6 +768,10 @@ class TDTController(Keyboard):
 
     def halt(self):
         """Wrapper for tdt.util.RPcoX.Halt()."""
+        self._end_stream()
+        self._wait_upload(cancel=True)
+        self._scheduler.close()
+        self._log_tag_stats()
         self.rpcox.Halt()
         logger.debug('Expyfun: Halting TDT circuit')
 
@@ -368,7 +779,7 @@ class TDTController(Keyboard):
     @property
     def fs(self):
         """Playback frequency of the audio (samples / second)."""
-        return np.float(self.rpcox.GetSFreq())
+        return self._fs
 
     @property
     def model(self):
@@ -5,12 +5,229 @@
 #
 # License: BSD (3-clause)
 
+from collections import deque
+import struct
+import sys
+from threading import Event, Thread
+import time
+
 import numpy as np
 
-from ._utils import wait_secs, verbose_dec
+from ._utils import verbose_dec, clock, logger, get_config, string_types
+
+# sleep until this long (sec) before a deadline, then spin
+_SPIN_TIME = 0.002
+
+
+def _wait_until(deadline, get_time):
+    """Wait until a time without keeping the CPU busy for long"""
+    while True:
+        remaining = deadline - get_time()
+        if remaining <= 0:
+            return
+        if remaining > _SPIN_TIME:
+            time.sleep(remaining - _SPIN_TIME)
+
+
+def _raise_thread_priority():
+    """Try to give the current thread a high priority (Windows only)"""
+    if sys.platform == 'win32':
+        try:
+            from ctypes import windll
+            kernel32 = windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(),
+                                       15)  # THREAD_PRIORITY_TIME_CRITICAL
+        except Exception as exp:
+            logger.debug('Expyfun: Could not raise trigger thread priority '
+                         '({0})'.format(exp))
+
+
+class _TriggerTrain(object):
+    """A scheduled sequence of triggers
+
+    ``done`` is an Event that is set once the last trigger has been stamped
+    (or stamping failed), and ``times`` holds the times the triggers were
+    actually stamped.
+    """
+    def __init__(self, triggers, deadlines):
+        self.triggers = list(triggers)
+        self.deadlines = list(deadlines)
+        self.times = list()
+        self.error = None
+        self.done = Event()
+
+    def wait(self):
+        """Wait for the last trigger, raising any error from stamping"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class _TriggerScheduler(object):
+    """Stamp trains of triggers at given times (from a background thread)
+
+    Parameters
+    ----------
+    stamp_trigger : callable
+        Function that stamps a single trigger.
+    name : str
+        Name for the log messages.
+    background : bool
+        If True (default), stamp from a background thread. Otherwise, stamp
+        from the calling thread, for devices that can only be used from it
+        (``stamp_triggers`` then returns after the last trigger).
+
+    Notes
+    -----
+    Each train starts once the previous one has finished (including its
+    final delay), and its triggers are stamped ``delay`` apart relative to
+    its start, so timing errors do not accumulate. ``clock`` is the clock
+    the deadlines and stamp times refer to; the actual stamp times are
+    logged (at the debug level).
+    """
+    def __init__(self, stamp_trigger, name='TTL', background=True):
+        self._stamp_trigger = stamp_trigger
+        self._name = name
+        self._background = background
+        self.clock = clock
+        self._trains = deque()
+        self._next_start = -np.inf
+        self._last_train = None
+        self._wake = Event()
+        self._closing = False
+        self._thread = None
+
+    def stamp_triggers(self, triggers, delay, wait_for_last=True):
+        """Schedule triggers ``delay`` apart, starting as soon as possible
+
+        Returns the train. With ``wait_for_last=True``, this waits until
+        ``delay`` after the last trigger (like stamping them one by one).
+        """
+        start = max(self.clock(), self._next_start)
+        deadlines = start + delay * np.arange(len(triggers))
+        self._next_start = start + delay * len(triggers)
+        train = _TriggerTrain(triggers, deadlines)
+        self._last_train = train
+        if not self._background:
+            self._stamp_train(train)
+        else:
+            if self._thread is None:
+                self._closing = False  # e.g., after a close()
+                self._wake.clear()
+                self._thread = Thread(target=self._run,
+                                      name='expyfun-triggers')
+                self._thread.daemon = True
+                self._thread.start()
+            self._trains.append(train)
+            self._wake.set()
+        if wait_for_last or not self._background:
+            train.wait()  # raises any error from stamping
+        if wait_for_last:
+            _wait_until(self._next_start, self.clock)
+        return train
+
+    def wait_idle(self):
+        """Wait until the scheduled triggers (and their final delay) are done
+
+        Use this before stamping triggers some other way, so they do not
+        end up in the middle of (or delayed behind) a scheduled train.
+        """
+        if self._last_train is not None:
+            self._last_train.done.wait()
+        _wait_until(self._next_start, self.clock)
+
+    def _run(self):
+        _raise_thread_priority()
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._trains:
+                self._stamp_train(self._trains[0])
+                self._trains.popleft()
+            if self._closing:
+                break
+
+    def _stamp_train(self, train):
+        try:
+            for trig, deadline in zip(train.triggers, train.deadlines):
+                _wait_until(deadline, self.clock)
+                t_stamp = self.clock()
+                self._stamp_trigger(trig)
+                train.times.append(t_stamp)
+                logger.debug('Expyfun: Stamped {0} trigger {1} at {2:0.6f} '
+                             '({3:+0.6f} sec late)'.format(
+                                 self._name, trig, t_stamp,
+                                 t_stamp - deadline))
+        except Exception as exp:
+            train.error = exp
+            logger.warning('Expyfun: {0} trigger stamping failed: {1}'
+                           ''.format(self._name, exp))
+        finally:
+            train.done.set()
+
+    def close(self):
+        """Stamp the remaining triggers, then stop the thread"""
+        self._closing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class TriggerController(object):
+    """Base class for trigger outputs
+
+    Subclasses stamp single triggers with ``_stamp_trigger(trig)`` (which
+    should return once the pulse is over), and release their resources in
+    ``close()`` (calling the base class method). Trains of triggers are
+    stamped from a background thread, see :meth:`stamp_triggers`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the output (used in log messages).
+
+    See Also
+    --------
+    register_trigger_backend
+    """
+    def __init__(self, name='TTL'):
+        self._scheduler = _TriggerScheduler(
+            lambda trig: self._stamp_trigger(trig), name)
+
+    def _stamp_trigger(self, trig):
+        raise NotImplementedError
+
+    def stamp_triggers(self, triggers, delay=0.03, wait_for_last=True):
+        """Stamp a list of triggers with a given inter-trigger delay
+
+        Parameters
+        ----------
+        triggers : list
+            No input checking is done, so ensure triggers is a list,
+            with each entry an integer with fewer than 8 bits (max 255).
+        delay : float
+            The inter-trigger delay.
+        wait_for_last : bool
+            If True, wait for last trigger to be stamped before returning.
+            Otherwise, return immediately (the triggers are stamped from a
+            background thread).
+
+        Returns
+        -------
+        done : instance of threading.Event
+            Set once the last trigger has been stamped.
+        """
+        return self._scheduler.stamp_triggers(triggers, delay,
+                                              wait_for_last).done
+
+    def close(self):
+        """Release hardware interfaces
+        """
+        self._scheduler.close()
 
 
-class ParallelTrigger(object):
+class ParallelTrigger(TriggerController):
     """Parallel port and dummy triggering support
 
     IMPORTANT: When using the parallel port, note that calling
@@ -86,6 +303,7 @@ class ParallelTrigger(object):
         else:  # mode == 'dummy':
             self._stamp_trigger = self._dummy_trigger
         self.high_duration = high_duration
+        super(ParallelTrigger, self).__init__(mode)
 
     def _dummy_trigger(self, trig):
         """Fake stamping"""
@@ -97,31 +315,106 @@ class ParallelTrigger(object):
     #    wait_secs(self.high_duration)
     #    self._set_data(0)
 
-    def stamp_triggers(self, triggers, delay=0.03, wait_for_last=True):
-        """Stamp a list of triggers with a given inter-trigger delay
-
-        Parameters
-        ----------
-        triggers : list
-            No input checking is done, so ensure triggers is a list,
-            with each entry an integer with fewer than 8 bits (max 255).
-        delay : float
-            The inter-trigger delay.
-        wait_for_last : bool
-            If True, wait for last trigger to be stamped before returning.
-        """
-        for ti, trig in enumerate(triggers):
-            self._stamp_trigger(trig)
-            if ti < len(triggers) - 1 or wait_for_last:
-                wait_secs(delay - self.high_duration)
-
     def close(self):
         """Release hardware interfaces
         """
+        super(ParallelTrigger, self).close()
         if hasattr(self, '_port'):
             del self._port
 
 
+class FileTrigger(TriggerController):
+    """Write triggers with their time stamps to a file (or pipe)
+
+    This stands in for trigger hardware, e.g. to check trigger timing on
+    machines without it.
+
+    Parameters
+    ----------
+    fname : str
+        The file (or named pipe) to append to. Each trigger is written
+        (unbuffered) as a 12-byte little-endian record: the time it was
+        stamped (float64, in seconds, on the clock of the
+        :class:`ExperimentController`) and its value (uint32), so a file
+        can be read (or memory-mapped) with e.g.
+        ``np.fromfile(fname, [('time', '<f8'), ('trigger', '<u4')])``.
+    """
+    _record = struct.Struct('<dI')
+
+    def __init__(self, fname):
+        self._fid = open(fname, 'ab', buffering=0)
+        super(FileTrigger, self).__init__('file')
+
+    def _stamp_trigger(self, trig):
+        self._fid.write(self._record.pack(self._scheduler.clock(), trig))
+
+    def close(self):
+        """Release hardware interfaces
+        """
+        super(FileTrigger, self).close()
+        self._fid.close()
+
+
+# name -> function(ec, params) that returns the trigger controller
+_trigger_backends = dict()
+
+
+def register_trigger_backend(name, factory):
+    """Make a trigger output available to the ExperimentController
+
+    Parameters
+    ----------
+    name : str
+        The name to use as the ``trigger_controller`` (or its ``'type'``).
+    factory : callable
+        Function that takes the :class:`ExperimentController` and the
+        ``trigger_controller`` dict (with at least the ``'type'`` entry)
+        and returns the trigger controller, usually an instance of a
+        :class:`TriggerController` subclass. The controller's ``close()``
+        will be called when the ExperimentController closes. Other objects
+        need ``stamp_triggers`` and ``close`` methods like those of
+        :class:`TriggerController`, but their triggers are not timed on
+        the clock of the ExperimentController, nor kept from overlapping
+        the stimulus onset trigger.
+
+    See Also
+    --------
+    TriggerController
+    """
+    if not isinstance(name, string_types):
+        raise TypeError('name must be a string, got {0}'.format(type(name)))
+    if not callable(factory):
+        raise TypeError('factory must be callable')
+    _trigger_backends[name] = factory
+
+
+def _make_parallel(ec, params):
+    if 'address' not in params:
+        params['address'] = get_config('TRIGGER_ADDRESS')
+    return ParallelTrigger(params['type'], params['address'])
+
+
+def _make_file(ec, params):
+    if 'fname' not in params:
+        params['fname'] = get_config('TRIGGER_FILE', raise_error=True)
+    return FileTrigger(params['fname'])
+
+
+def _make_tdt(ec, params):
+    from ._tdt_controller import TDTController
+    if not isinstance(ec._ac, TDTController):
+        raise ValueError('trigger_controller can only be "tdt" if '
+                         'tdt is used for audio')
+    return ec._ac
+
+
+for _name, _factory in (('dummy', _make_parallel),
+                        ('parallel', _make_parallel),
+                        ('file', _make_file),
+                        ('tdt', _make_tdt)):
+    register_trigger_backend(_name, _factory)
+
+
 def decimals_to_binary(decimals, n_bits):
     """Convert a sequence of decimal numbers to a sequence of binary numbers
 
@@ -18,7 +18,7 @@ import atexit
 import json
 from functools import partial
 from distutils.version import LooseVersion
-from numpy import sqrt, convolve, ones
+from numpy import sqrt
 from numpy.testing.decorators import skipif
 import logging
 import datetime
@@ -559,12 +559,15 @@ known_config_types = ('RESPONSE_DEVICE',
                       'TDT_INTERFACE',
                       'TDT_CIRCUIT_PATH',
                       'TRIGGER_CONTROLLER',
+                      'TRIGGER_FILE',
                       'WINDOW_SIZE',
                       'SCREEN_NUM',
                       'SCREEN_WIDTH',
                       'SCREEN_DISTANCE',
                       'SCREEN_SIZE_PIX',
                       'EXPYFUN_LOGGING_LEVEL',
+                      'NOISE_CACHE_DIR',
+                      'NOISE_SEED',
                       )
 
 # These allow for partial matches: 'NAME_1' is okay key if 'NAME' is listed
@@ -735,17 +738,64 @@ def wait_secs(secs, ec=None):
             ec.check_force_quit()
 
 
+# number of windows to compute at a time in _iter_running_ms
+_RMS_BLOCK = 2 ** 16
+
+
 def running_rms(signal, win_length):
     """RMS of ``signal`` with rectangular window ``win_length`` samples long.
 
     Parameters
     ----------
     signal : array_like
-        The (1-dimesional) signal of interest.
+        The signal of interest. If 2-dimensional, the RMS of each row is
+        computed.
     win_length : int
         Length (in samples) of the rectangular window
     """
-    return sqrt(convolve(signal ** 2, ones(win_length) / win_length, 'valid'))
+    signal = np.asarray(signal)
+    return sqrt(np.concatenate(list(_iter_running_ms(signal, win_length)),
+                               axis=-1))
+
+
+def _max_running_rms(signal, win_length, stop_above=None):
+    """Maximum of running_rms over all rows of ``signal``
+
+    If ``stop_above`` is given, stop as soon as it is exceeded (so the
+    result is only guaranteed to be larger than ``stop_above``).
+    """
+    max_ms = 0.
+    stop_above = np.inf if stop_above is None else stop_above ** 2
+    for ms in _iter_running_ms(np.asarray(signal), win_length):
+        max_ms = max(max_ms, ms.max())
+        if max_ms > stop_above:
+            break
+    return sqrt(max_ms)
+
+
+def _iter_running_ms(signal, win_length):
+    """Yield the running mean square along the last axis in blocks
+
+    This uses cumulative sums (O(N) instead of O(N * win_length)) of float64
+    squares, restarted for each block to keep the rounding error small.
+    """
+    win_length = int(win_length)
+    n_samp = signal.shape[-1]
+    if n_samp < win_length:
+        # like np.convolve(..., 'valid') with the arguments swapped
+        ms = np.sum(signal.astype(np.float64) ** 2, axis=-1, keepdims=True)
+        yield np.repeat(ms / win_length, win_length - n_samp + 1, axis=-1)
+        return
+    n_out = n_samp - win_length + 1
+    for start in range(0, n_out, _RMS_BLOCK):
+        stop = min(start + _RMS_BLOCK, n_out)
+        cumsum = np.zeros(signal.shape[:-1] + (stop - start + win_length,))
+        cumsum[..., 1:] = signal[..., start:stop + win_length - 1]
+        cumsum *= cumsum
+        np.cumsum(cumsum, axis=-1, out=cumsum)
+        ms = cumsum[..., win_length:] - cumsum[..., :-win_length]
+        ms /= win_length
+        yield np.maximum(ms, 0., out=ms)  # rounding can make these negative
 
 
 def _fix_audio_dims(signal, n_channels=None):
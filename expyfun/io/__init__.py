@@ -2,8 +2,10 @@
 from ._wav import read_wav, write_wav
 from .._externals._h5io import (read_hdf5 as _read_hdf5,
                                 write_hdf5 as _write_hdf5)
-from ._parse import (read_tab, reconstruct_tracker, 
-                     reconstruct_dealer, read_tab_raw)
+from ._parse import (read_tab, reconstruct_tracker,
+                     reconstruct_dealer, read_tab_raw, iter_tab,
+                     read_tab_many)
+from ._binary import read_tab_binary, tab_to_binary
 
 
 def read_hdf5(fname):
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Binary event log functions
+"""
+
+import mmap
+import struct
+from os import path as op
+
+import numpy as np
+
+from .._utils import _sanitize
+
+# File layout (all little-endian):
+#
+# ``fname``: a 16-byte header (magic + version) followed by fixed-size
+#     records of (timestamp, event code, value size, value offset).
+# ``fname + '.val'``: the UTF-8 encoded values, back to back.
+#
+# The first time an event type is seen, a record with the reserved code
+# _DEFINE is written whose value is the event type name. Event codes are
+# assigned in order of these definitions. Everything is append-only, so a
+# session that is interrupted still leaves a readable file.
+_MAGIC = b'EXPYFUNB'
+_VERSION = 1
+_HEADER = struct.Struct('<8sI4x')
+_RECORD = struct.Struct('<dIIQ')
+_DEFINE = 2 ** 32 - 1
+_rec_dtype = np.dtype([('timestamp', '<f8'), ('code', '<u4'),
+                       ('size', '<u4'), ('offset', '<u8')])
+assert _rec_dtype.itemsize == _RECORD.size
+
+
+class _BinaryWriter(object):
+    """Write (timestamp, event, value) entries to a binary event log"""
+
+    def __init__(self, fname):
+        self._fid = open(fname, 'wb')
+        self._fid_val = open(fname + '.val', 'wb')
+        self._fid.write(_HEADER.pack(_MAGIC, _VERSION))
+        self._codes = dict()
+        self._offset = 0
+
+    def _write(self, timestamp, code, value):
+        value = value.encode('utf-8')
+        self._fid_val.write(value)
+        self._fid.write(_RECORD.pack(timestamp, code, len(value),
+                                     self._offset))
+        self._offset += len(value)
+
+    def write(self, timestamp, event_type, value):
+        if not self._fid.closed:
+            event_type = _sanitize(event_type)
+            code = self._codes.get(event_type)
+            if code is None:
+                code = self._codes[event_type] = len(self._codes)
+                self._write(np.nan, _DEFINE, event_type)
+            self._write(float(timestamp), code, _sanitize(value))
+
+    def flush(self):
+        if not self._fid.closed:
+            # values first, so records never point past the end of the blob
+            self._fid_val.flush()
+            self._fid.flush()
+
+    def close(self):
+        self.flush()
+        self._fid_val.close()
+        self._fid.close()
+
+
+def read_tab_binary(fname, values=True):
+    """Read a binary event log written by ExperimentController
+
+    Parameters
+    ----------
+    fname : str
+        Input filename (e.g., the ``.bin`` file written alongside the
+        ``.tab`` file when using ``data_binary=True``).
+    values : bool
+        If False, do not load the values (``values`` will be None). This
+        avoids creating one Python string per event.
+
+    Returns
+    -------
+    times : ndarray, shape (n_events,)
+        The float64 timestamps.
+    codes : ndarray, shape (n_events,)
+        The integer event type of each event, indexing ``event_types``.
+    event_types : list of str
+        The event type names.
+    values : ndarray of str, shape (n_events,) | None
+        The values as they would be read from the ``.tab`` file.
+
+    See Also
+    --------
+    read_tab_raw
+    tab_to_binary
+    """
+    with open(fname, 'rb') as fid:
+        header = fid.read(_HEADER.size)
+    if len(header) != _HEADER.size or _HEADER.unpack(header)[0] != _MAGIC:
+        raise ValueError('File does not appear to be an expyfun binary event '
+                         'log: {0}'.format(fname))
+    version = _HEADER.unpack(header)[1]
+    if version > _VERSION:
+        raise RuntimeError('Binary event log version {0} is not supported, '
+                           'update expyfun'.format(version))
+    # ignore a partially written record at the end
+    n_rec = (op.getsize(fname) - _HEADER.size) // _rec_dtype.itemsize
+    if n_rec > 0:
+        rec = np.memmap(fname, _rec_dtype, 'r', _HEADER.size, (n_rec,))
+    else:
+        rec = np.zeros(0, _rec_dtype)
+    defs = rec['code'] == _DEFINE
+    with open(fname + '.val', 'rb') as fid:
+        if op.getsize(fname + '.val') > 0:
+            blob = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            blob = b''
+    try:
+        event_types = _get_values(blob, rec[defs])
+        rec = rec[~defs]
+        times = np.array(rec['timestamp'], np.float64)
+        codes = np.array(rec['code'], np.intp)
+        if values:
+            values = np.empty(len(rec), object)
+            values[:] = _get_values(blob, rec)
+        else:
+            values = None
+    finally:
+        if not isinstance(blob, bytes):
+            blob.close()
+    return times, codes, event_types, values
+
+
+def _get_values(blob, rec):
+    """Helper to pull the value strings for a set of records"""
+    offsets = rec['offset'].tolist()
+    ends = (rec['offset'] + rec['size']).tolist()
+    return [blob[o:e].decode('utf-8') for o, e in zip(offsets, ends)]
+
+
+def tab_to_binary(fname, fname_out=None, overwrite=False):
+    """Convert a .tab file to a binary event log
+
+    Parameters
+    ----------
+    fname : str
+        The ``.tab`` file to convert.
+    fname_out : str | None
+        The output filename. If None, the extension of ``fname`` is replaced
+        with ``.bin``. The values are written to ``fname_out + '.val'``.
+    overwrite : bool
+        If True, overwrite existing output files.
+
+    Returns
+    -------
+    fname_out : str
+        The output filename.
+
+    See Also
+    --------
+    read_tab_binary
+    """
+    from ._parse import read_tab_raw
+    if fname_out is None:
+        fname_out = op.splitext(fname)[0] + '.bin'
+    if not overwrite and op.isfile(fname_out):
+        raise IOError('File {} exists, overwrite=True must be '
+                      'used'.format(op.basename(fname_out)))
+    times, codes, event_types, values = read_tab_raw(fname,
+                                                     return_arrays=True)
+    # insert the definition records at the first occurrence of each type
+    # (codes are numbered in order of first occurrence)
+    first = np.unique(codes, return_index=True)[1]
+    times = np.insert(times, first, np.nan)
+    codes = np.insert(codes, first, _DEFINE)
+    values = np.insert(values, first, event_types)
+    values = [value.encode('utf-8') for value in values]
+    rec = np.empty(len(values), _rec_dtype)
+    rec['timestamp'] = times
+    rec['code'] = codes
+    rec['size'] = [len(value) for value in values]
+    rec['offset'] = np.cumsum(rec['size']) - rec['size']
+    with open(fname_out, 'wb') as fid:
+        fid.write(_HEADER.pack(_MAGIC, _VERSION))
+        fid.write(rec.tobytes())
+    with open(fname_out + '.val', 'wb') as fid:
+        fid.write(b''.join(values))
+    return fname_out
@@ -5,45 +5,197 @@
 import numpy as np
 import csv
 import ast
+import gzip
 import json
+import hashlib
+import io
+import os
+from os import path as op
+import pickle
+import time
 
+from .._utils import logger, string_types
+from .._parallel import parallel_func
 
-def read_tab_raw(fname):
+
+# bytes of the .tab file to parse at once when building arrays
+_CHUNK_SIZE = 2 ** 24
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def read_tab_raw(fname, return_arrays=False):
     """Read .tab file from expyfun output without segmenting into trials.
 
     Parameters
     ----------
     fname : str
         Input filename.
+    return_arrays : bool
+        If True, return arrays (see below) instead of a list of tuples.
+        This is much faster and uses much less memory for large files.
 
     Returns
     -------
     data : list of tuple
         The data with each line from the tab file being a tuple in a list.
         Each tuple is of the form (``timestamp``, ``key``, ``value``).
+        Only returned if ``return_arrays=False``.
+    times : ndarray, shape (n_lines,)
+        The float64 timestamps. Only returned if ``return_arrays=True``.
+    codes : ndarray, shape (n_lines,)
+        The integer key of each line, indexing ``keys`` (in order of first
+        occurrence). Only returned if ``return_arrays=True``.
+    keys : list of str
+        The unique keys. Only returned if ``return_arrays=True``.
+    values : ndarray of str, shape (n_lines,)
+        The values. Only returned if ``return_arrays=True``.
 
     See Also
     --------
     read_tab
+    read_tab_binary
     """
-    with open(fname, 'r') as f:
-        csvr = csv.reader(f, delimiter='\t')
-        lines = [c for c in csvr]
-
-    # first two lines are headers
-    assert (len(lines[0]) == 1 and lines[0][0][0] == '#')
-    #metadata = ast.literal_eval(lines[0][0][2:])
-    assert lines[1] == ['timestamp', 'event', 'value']
-    lines = lines[2:]
-
-    times = [float(line[0]) for line in lines]
-    keys = [line[1] for line in lines]
-    vals = [line[2] for line in lines]
-    data = list(zip(times, keys, vals))
-    return data
+    times, codes, keys, values = _read_tab_arrays(fname)
+    if return_arrays:
+        return times, codes, keys, values
+    keys = [keys[c] for c in codes.tolist()]
+    return list(zip(times.tolist(), keys, values.tolist()))
+
+
+def _read_tab_arrays(fname, return_offsets=False):
+    """Parse a .tab file in chunks, returning arrays
+
+    If ``return_offsets``, also return the byte offset of the start of each
+    line, plus the offset of the end of the data (in the decompressed data
+    for compressed files).
+    """
+    with _open_tab(fname) as fid:
+        # first two lines are headers
+        lines = [fid.readline() for _ in range(2)]
+        _check_header(lines)
+        key_map = dict()
+        times, codes, values, offsets = list(), list(), list(), list()
+        base = sum(len(line) for line in lines)
+        rest = b''
+        while True:
+            chunk = fid.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            split = chunk.rfind(b'\n') + 1
+            chunk, rest = chunk[:split], chunk[split:]
+            _parse_chunk(chunk, key_map, times, codes, values)
+            if return_offsets and len(chunk) > 0:
+                ends = np.where(np.frombuffer(chunk, np.uint8) == 10)[0] + 1
+                offsets.append(base + np.concatenate([[0], ends[:-1]]))
+            base += len(chunk)
+        if len(rest) > 0:
+            _parse_chunk(rest + b'\n', key_map, times, codes, values)
+            offsets.append([base])
+        offsets.append([base + len(rest)])
+    keys = sorted(key_map, key=key_map.get)
+    times = np.concatenate([np.zeros(0)] + times)
+    codes = np.concatenate([np.zeros(0, np.intp)] + codes)
+    values = np.concatenate([np.zeros(0, object)] + values)
+    if return_offsets:
+        return times, codes, keys, values, np.concatenate(offsets)
+    return times, codes, keys, values
+
+
+def _get_compression(fname):
+    """Determine the compression of a file from its magic bytes"""
+    with open(fname, 'rb') as fid:
+        magic = fid.read(len(_ZSTD_MAGIC))
+    if magic.startswith(_GZIP_MAGIC):
+        return 'gzip'
+    elif magic == _ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+def _open_tab(fname, seekable=False):
+    """Open a (possibly compressed) .tab file for reading bytes"""
+    compression = _get_compression(fname)
+    if compression is None:
+        return open(fname, 'rb')
+    if compression == 'gzip':
+        fid = io.BufferedReader(_GzipReader(fname))
+    else:  # compression == 'zstd'
+        import zstandard
+        fid = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(fname, 'rb'), read_across_frames=True))
+    if seekable:
+        with fid:
+            fid = io.BytesIO(fid.read())
+    return fid
+
+
+class _GzipReader(io.RawIOBase):
+    """Read a gzip file, treating a truncated stream as ended
+
+    The data file of a running (or crashed) experiment has not been closed,
+    so it lacks the gzip end-of-stream marker.
+    """
+
+    def __init__(self, fname):
+        self._fid = gzip.GzipFile(fname, 'rb')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        try:
+            data = self._fid.read1(len(b))
+        except EOFError:
+            data = b''
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._fid.close()
+        super(_GzipReader, self).close()
+
 
+def _check_header(lines):
+    """Check the two header lines of a .tab file"""
+    lines = [line.decode('utf-8', 'replace').rstrip('\r\n') for line in lines]
+    assert len(lines[0]) > 0 and lines[0][0] == '#'
+    #metadata = ast.literal_eval(lines[0][2:])
+    assert lines[1].split('\t') == ['timestamp', 'event', 'value']
 
-def read_tab(fname, group_start='trial_id', group_end='trial_ok'):
+
+def _parse_chunk(chunk, key_map, times, codes, values):
+    """Parse complete lines, updating the key map and output lists"""
+    # Written values are escaped, so a line only contains tabs as field
+    # separators and there is no quoting (except by csv.reader for a field
+    # starting with a quote character, which we do not want to change).
+    text = chunk.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    text = text[:-1]
+    if len(text) == 0:
+        return
+    n_lines = text.count('\n') + 1
+    fields = text.replace('\n', '\t').split('\t')
+    if len(fields) != 3 * n_lines or '\t"' in text:
+        fields = list()
+        for line in csv.reader(text.split('\n'), delimiter='\t'):
+            if len(line) != 3:
+                raise ValueError('Malformed line in .tab file: {0}'
+                                 ''.format('\t'.join(line)))
+            fields.extend(line)
+    # codes are assigned in order of first occurrence
+    codes.append(np.fromiter((key_map.setdefault(key, len(key_map))
+                              for key in fields[1::3]), np.intp, n_lines))
+    times.append(np.array(fields[0::3], np.float64))
+    this_values = np.empty(n_lines, object)
+    this_values[:] = fields[2::3]
+    values.append(this_values)
+
+
+def read_tab(fname, group_start='trial_id', group_end='trial_ok',
+             flat=False, trials=None):
     """Read .tab file from expyfun output and segment into trials.
 
     Parameters
@@ -55,24 +207,282 @@ def read_tab(fname, group_start='trial_id', group_end='trial_ok'):
     group_end : str | None
         Key to use to end a trial/row. If None, the next ``group_start``
         will end the current group.
+    flat : bool
+        If True, return a flat table of all events that occur within
+        trials instead of a list of dict.
+    trials : int | slice | array-like of int | None
+        The trials to read. If not None, an index of trial locations in the
+        file is used (and built if necessary, see Notes) so that only the
+        requested trials are read.
 
     Returns
     -------
-    data : list of dict
-        The data, with a dict for each trial. Each value in the dict
-        is a list of tuples (event, time) for each occurrence of that
-        key.
+    data : list of dict | dict
+        If ``flat=False``, the data, with a dict for each trial. Each value
+        in the dict is a list of tuples (event, time) for each occurrence of
+        that key. If ``flat=True``, a dict with keys ``'trial'``,
+        ``'timestamp'``, ``'event'``, and ``'value'``, each an array with
+        one entry per event (in file order).
 
     See Also
     --------
     read_tab_raw
+
+    Notes
+    -----
+    The trial index is stored next to the file as ``fname + '.idx'``. It is
+    rebuilt automatically when the size or modification time of the file
+    change, or when different ``group_start`` or ``group_end`` values are
+    used. Compressed files (see ``data_compression`` in
+    :class:`expyfun.ExperimentController`) are read transparently, but
+    they must be decompressed in full (in memory) to read some ``trials``.
+    """
+    if trials is None:
+        times, codes, keys, values = _read_tab_arrays(fname)
+        header, b1s, b2s = _get_bounds(keys, codes, group_start, group_end)
+        # assign each event to its trial (-1 for events between trials)
+        idx = np.arange(len(codes))
+        trial = np.searchsorted(b1s, idx, 'right') - 1
+        trial[(trial < 0) | (idx >= b2s[np.maximum(trial, 0)])] = -1
+        mask = trial >= 0
+        trial, times, codes, values = (trial[mask], times[mask], codes[mask],
+                                       values[mask])
+        picks = np.arange(len(b1s))
+    else:
+        index = _get_tab_index(fname, group_start, group_end)
+        header = index['header'].tolist()
+        picks = np.atleast_1d(np.arange(len(index['starts']))[trials])
+        key_map = dict()
+        times, codes, values, trial = list(), list(), list(), list()
+        with _open_tab(fname, seekable=True) as fid:
+            for ii, pick in enumerate(picks):
+                fid.seek(index['starts'][pick])
+                chunk = fid.read(index['stops'][pick] - index['starts'][pick])
+                if not chunk.endswith(b'\n'):
+                    chunk += b'\n'
+                _parse_chunk(chunk, key_map, times, codes, values)
+                trial.append(np.full(len(times[-1]), ii, np.intp))
+        keys = sorted(key_map, key=key_map.get)
+        times, codes, values, trial = [
+            np.concatenate([np.zeros(0, dtype)] + x) for x, dtype in
+            ((times, float), (codes, np.intp), (values, object),
+             (trial, np.intp))]
+    if flat:
+        return dict(trial=picks[trial], timestamp=times,
+                    event=np.array(keys, object)[codes], value=values)
+    data = [{key: [] for key in header} for _ in range(len(picks))]
+    for ti, code, value, t in zip(trial.tolist(), codes.tolist(),
+                                  values.tolist(), times.tolist()):
+        data[ti][keys[code]].append((value, t))
+    return data
+
+
+def iter_tab(fname, group_start='trial_id', group_end='trial_ok',
+             follow=False, poll=0.1, timeout=None):
+    """Iterate over the trials of a .tab file as they are completed.
+
+    Parameters
+    ----------
+    fname : str
+        Input filename.
+    group_start : str
+        Key to use to start a trial/row.
+    group_end : str | None
+        Key to use to end a trial/row. If None, the next ``group_start``
+        will end the current group.
+    follow : bool
+        If True, keep waiting for lines to be appended to the file (e.g.,
+        by a running experiment) instead of stopping at the end of the file.
+        Cannot be used with compressed files.
+    poll : float
+        Time (in seconds) to wait between checks for new data when
+        following.
+    timeout : float | None
+        When following, stop after no new data has been written for this
+        many seconds. None (default) waits forever.
+
+    Yields
+    ------
+    trial : dict
+        The data for one trial, in the format used by :func:`read_tab`.
+        The dict has an entry for each key seen in the file so far.
+
+    See Also
+    --------
+    read_tab
+
+    Notes
+    -----
+    The file is read incrementally, so each new trial only requires
+    parsing the newly written lines.
+    """
+    if group_end == group_start:
+        raise ValueError('group_start cannot equal group_end, use '
+                         'group_end=None')
+    if follow and _get_compression(fname) is not None:
+        raise ValueError('Cannot follow a compressed file')
+    key_map = dict()
+    trial = [None]  # the trial in progress
+
+    def _process(chunk):
+        times, codes, values = list(), list(), list()
+        _parse_chunk(chunk, key_map, times, codes, values)
+        if len(times) == 0:
+            return
+        keys = sorted(key_map, key=key_map.get)
+        for code, value, t in zip(codes[0].tolist(), values[0].tolist(),
+                                  times[0].tolist()):
+            key = keys[code]
+            if key == group_start:
+                if trial[0] is not None:
+                    if group_end is not None:
+                        raise RuntimeError('bad bounds: "{0}" at time {1} '
+                                           'before "{2}"'.format(
+                                               group_start, t, group_end))
+                    yield _fill_trial(trial[0], keys)
+                trial[0] = dict()
+            if trial[0] is not None:
+                trial[0].setdefault(key, list()).append((value, t))
+            if key == group_end:
+                if trial[0] is None:
+                    raise RuntimeError('bad bounds: "{0}" at time {1} '
+                                       'without "{2}"'.format(
+                                           group_end, t, group_start))
+                yield _fill_trial(trial[0], keys)
+                trial[0] = None
+
+    rest = b''
+    header = False
+    last_time = time.time()
+    with _open_tab(fname) as fid:
+        while True:
+            chunk = fid.read(_CHUNK_SIZE)
+            if not chunk:
+                waited = time.time() - last_time
+                if not follow or (timeout is not None and waited > timeout):
+                    break
+                time.sleep(poll)
+                continue
+            last_time = time.time()
+            rest += chunk
+            if not header:
+                if rest.count(b'\n') < 2:
+                    continue
+                lines = rest.split(b'\n', 2)
+                _check_header(lines[:2])
+                rest = lines[2]
+                header = True
+            split = rest.rfind(b'\n') + 1
+            chunk, rest = rest[:split], rest[split:]
+            for out in _process(chunk):
+                yield out
+    if not header:
+        _check_header((rest.split(b'\n') + [b'', b''])[:2])
+    for out in _process(rest + b'\n'):
+        yield out
+    if group_end is None and trial[0] is not None:
+        yield _fill_trial(trial[0], sorted(key_map, key=key_map.get))
+
+
+def _fill_trial(trial, keys):
+    """Add empty entries for keys that do not occur in a trial"""
+    for key in keys:
+        trial.setdefault(key, list())
+    return trial
+
+
+def read_tab_many(fnames, group_start='trial_id', group_end='trial_ok',
+                  n_jobs=1, cache_dir=None):
+    """Read and combine .tab files from many sessions.
+
+    Parameters
+    ----------
+    fnames : list of str
+        Input filenames.
+    group_start : str
+        Key to use to start a trial/row.
+    group_end : str | None
+        Key to use to end a trial/row. If None, the next ``group_start``
+        will end the current group.
+    n_jobs : int
+        Number of files to read in parallel (requires ``joblib``).
+    cache_dir : str | None
+        Directory in which to cache the parsed files. Cached results are
+        used when the file contents (and the grouping) are unchanged.
+
+    Returns
+    -------
+    data : dict
+        A flat table (see :func:`read_tab` with ``flat=True``) of all events
+        within trials from all files, with the additional entries ``'file'``
+        (the index into ``fnames``), ``'participant'`` and ``'session'``
+        (taken from the header line of each file).
+
+    See Also
+    --------
+    read_tab
     """
-    # load everything into memory for ease of use
-    lines = read_tab_raw(fname)
+    if isinstance(fnames, string_types):
+        raise TypeError('fnames must be a list of str, not str')
+    if cache_dir is not None and not op.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    parallel, p_fun, _ = parallel_func(_read_tab_cached, n_jobs)
+    out = parallel(p_fun(fname, group_start, group_end, cache_dir)
+                   for fname in fnames)
+    data = dict()
+    for key in ('file', 'participant', 'session', 'trial', 'timestamp',
+                'event', 'value'):
+        data[key] = list()
+    for fi, (info, flat) in enumerate(out):
+        n = len(flat['trial'])
+        data['file'].append(np.full(n, fi, np.intp))
+        for key in ('participant', 'session'):
+            data[key].append(np.empty(n, object))
+            data[key][-1].fill(info.get(key))
+        for key in flat:
+            data[key].append(flat[key])
+    dtypes = dict(file=np.intp, trial=np.intp, timestamp=np.float64)
+    for key in data:
+        data[key] = np.concatenate(
+            [np.zeros(0, dtypes.get(key, object))] + data[key])
+    return data
+
+
+def _read_tab_info(fname):
+    """Read the experiment info dict from the first line of a .tab file"""
+    with _open_tab(fname) as fid:
+        line = fid.readline().decode('utf-8', 'replace').rstrip('\r\n')
+    try:
+        return ast.literal_eval(line[2:])
+    except Exception:  # e.g., objects without a literal repr
+        logger.warning('Could not parse header of {0}'.format(fname))
+        return dict()
+
 
+def _read_tab_cached(fname, group_start, group_end, cache_dir):
+    """Read the header and flat table of a .tab file, possibly cached"""
+    if cache_dir is not None:
+        hasher = hashlib.sha1()
+        hasher.update(repr((group_start, group_end)).encode('utf-8'))
+        with open(fname, 'rb') as fid:
+            for block in iter(lambda: fid.read(_CHUNK_SIZE), b''):
+                hasher.update(block)
+        cache_fname = op.join(cache_dir, hasher.hexdigest() + '.pkl')
+        if op.isfile(cache_fname):
+            with open(cache_fname, 'rb') as fid:
+                return pickle.load(fid)
+    out = (_read_tab_info(fname),
+           read_tab(fname, group_start, group_end, flat=True))
+    if cache_dir is not None:
+        with open(cache_fname, 'wb') as fid:
+            pickle.dump(out, fid, pickle.HIGHEST_PROTOCOL)
+    return out
+
+
+def _get_bounds(keys, codes, group_start, group_end):
+    """Get the sorted header and the line bounds of each trial"""
     # determine the event fields
-    header = list(set([l[1] for l in lines]))
-    header.sort()
+    header = sorted(keys)
     if group_start not in header:
         raise ValueError('group_start "{0}" not in header: {1}'
                          ''.format(group_start, header))
@@ -80,32 +490,47 @@ def read_tab(fname, group_start='trial_id', group_end='trial_ok'):
         raise ValueError('group_start cannot equal group_end, use '
                          'group_end=None')
     header = [header.pop(header.index(group_start))] + header
-    b1s = np.where([line[1] == group_start for line in lines])[0]
+    b1s = np.where(codes == keys.index(group_start))[0]
     if group_end is None:
-        b2s = np.concatenate((b1s[1:], [len(lines)]))
+        b2s = np.concatenate((b1s[1:], [len(codes)])).astype(np.intp)
     else:  # group_end is not None
         if group_end not in header:
             raise ValueError('group_end "{0}" not in header ({1})'
                              ''.format(group_end, header))
         header.append(header.pop(header.index(group_end)))
-        b2s = np.where([line[1] == group_end for line in lines])[0]
-    if len(b1s) != len(b2s) or not np.all(b1s < b2s):
+        b2s = np.where(codes == keys.index(group_end))[0] + 1  # include end
+    if len(b1s) != len(b2s) or not np.all(b1s < b2s) or \
+            not np.all(b2s[:-1] <= b1s[1:]):
         raise RuntimeError('bad bounds:\n{0}\n{1}'.format(b1s, b2s))
-    data = []
-    for b1, b2 in zip(b1s, b2s):
-        assert lines[b1][1] == group_start  # prevent stupidity
-        if group_end is not None:
-            b2 = b2 + 1  # include the end
-            assert lines[b2 - 1][1] == group_end
-        d = dict()
-        these_times = [float(line[0]) for line in lines[b1:b2]]
-        these_keys = [line[1] for line in lines[b1:b2]]
-        these_vals = [line[2] for line in lines[b1:b2]]
-        for ki, key in enumerate(header):
-            idx = np.where(key == np.array(these_keys))[0]
-            d[key] = [(these_vals[ii], these_times[ii]) for ii in idx]
-        data.append(d)
-    return data
+    return header, b1s, b2s
+
+
+def _get_tab_index(fname, group_start, group_end):
+    """Load (or build and save) the trial index of a .tab file"""
+    idx_fname = fname + '.idx'
+    stat = os.stat(fname)
+    groups = [group_start, '' if group_end is None else group_end]
+    try:
+        with np.load(idx_fname, allow_pickle=False) as fid:
+            index = dict((key, fid[key]) for key in fid.files)
+        if index['size'] == stat.st_size and \
+                index['mtime'] == stat.st_mtime and \
+                index['groups'].tolist() == groups:
+            return index
+    except Exception:  # missing or unreadable
+        pass
+    times, codes, keys, values, offsets = _read_tab_arrays(
+        fname, return_offsets=True)
+    header, b1s, b2s = _get_bounds(keys, codes, group_start, group_end)
+    index = dict(size=stat.st_size, mtime=stat.st_mtime,
+                 groups=np.array(groups), header=np.array(header),
+                 starts=offsets[b1s], stops=offsets[b2s])
+    try:
+        with open(idx_fname, 'wb') as fid:
+            np.savez(fid, **index)
+    except (IOError, OSError):
+        logger.info('Could not write trial index {0}'.format(idx_fname))
+    return index
 
 
 def reconstruct_tracker(fname):
@@ -124,42 +549,52 @@ def reconstruct_tracker(fname):
         the generation of the file.) If only one tracker is found in the file,
         it will still be stored in a list and will be accessible as ``tr[0]``.
     """
-    from ..stimuli import TrackerUD, TrackerBinom
-    # read in raw data
-    raw = read_tab_raw(fname)
+    return _reconstruct_trackers(*_read_tab_events(fname))
+
+
+def _read_tab_events(fname):
+    """Parse a .tab file, indexing the rows of each event type"""
+    times, codes, keys, values = _read_tab_arrays(fname)
+    order = np.argsort(codes, kind='mergesort')  # stable
+    bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+    events = dict((key, order[bounds[ki]:bounds[ki + 1]])
+                  for ki, key in enumerate(keys))
+    return events, values
 
+
+def _reconstruct_trackers(events, values):
+    """Reconstruct the trackers from an event index"""
+    from ..stimuli import TrackerUD, TrackerBinom
     # find tracker_identify and make list of IDs
-    tracker_idx = np.where([r[1] == 'tracker_identify' for r in raw])[0]
+    tracker_idx = events.get('tracker_identify', [])
     if len(tracker_idx) == 0:
         raise ValueError('There are no Trackers in this file.')
     tr = []
     for ii in tracker_idx:
-        tracker_id = ast.literal_eval(raw[ii][2])['tracker_id']
-        tracker_type = ast.literal_eval(raw[ii][2])['tracker_type']
+        identify = ast.literal_eval(values[ii])
+        tracker_id = identify['tracker_id']
+        tracker_type = identify['tracker_type']
         # find tracker_ID_init lines and get dict
         init_str = 'tracker_' + str(tracker_id) + '_init'
-        tracker_dict_idx = np.where([r[1] == init_str for r in raw])[0][0]
-        tracker_dict = json.loads(raw[tracker_dict_idx][2])
+        tracker_dict = json.loads(values[events[init_str][0]])
         td = dict(TrackerUD=TrackerUD, TrackerBinom=TrackerBinom)
         tr.append(td[tracker_type](**tracker_dict))
         tr[-1]._tracker_id = tracker_id  # make sure tracker has original ID
         stop_str = 'tracker_' + str(tracker_id) + '_stop'
-        tracker_stop_idx = np.where([r[1] == stop_str for r in raw])[0]
+        tracker_stop_idx = events.get(stop_str, [])
         if len(tracker_stop_idx) == 0:
             raise ValueError('Tracker {} has not stopped. All Trackers '
                              'must be stopped.'.format(tracker_id))
-        responses = json.loads(raw[tracker_stop_idx[0]][2])['responses']
-        # feed in responses from tracker_ID_stop
-        for r in responses:
-            tr[-1].respond(r)
+        # restore the stopped state from tracker_ID_stop
+        tr[-1]._restore(json.loads(values[tracker_stop_idx[0]]))
     return tr
 
 
 def reconstruct_dealer(fname):
     """Reconstruct TrackerDealer object from .tab files.
 
-    The ``reconstruct_tracker`` function will be called to retrieve the
-    trackers.
+    The trackers are reconstructed as in ``reconstruct_tracker``, using the
+    same single read of the file.
 
     Parameters
     ----------
@@ -174,27 +609,21 @@ def reconstruct_dealer(fname):
         still be stored in a list and will be assessible as ``td[0]``.
     """
     from ..stimuli import TrackerDealer
-    raw = read_tab_raw(fname)
+    events, values = _read_tab_events(fname)
 
     # find infor on dealer
-    dealer_idx = np.where([r[1] == 'dealer_identify' for r in raw])[0]
+    dealer_idx = events.get('dealer_identify', [])
     if len(dealer_idx) == 0:
         raise ValueError('There are no TrackerDealers in this file.')
+    # match up tracker objects to id
+    trackers = dict((tr._tracker_id, tr)
+                    for tr in _reconstruct_trackers(events, values))
     dealer = []
     for ii in dealer_idx:
-        dealer_id = ast.literal_eval(raw[ii][2])['dealer_id']
+        dealer_id = ast.literal_eval(values[ii])['dealer_id']
         dealer_init_str = 'dealer_' + str(dealer_id) + '_init'
-        dealer_dict_idx = np.where([r[1] == dealer_init_str
-                                    for r in raw])[0][0]
-        dealer_dict = ast.literal_eval(raw[dealer_dict_idx][2])
-        dealer_trackers = dealer_dict['trackers']
-
-        # match up tracker objects to id
-        trackers = reconstruct_tracker(fname)
-        tr_objects = []
-        for t in dealer_trackers:
-            idx = np.where([t == t_id._tracker_id for t_id in trackers])[0][0]
-            tr_objects.append(trackers[idx])
+        dealer_dict = ast.literal_eval(values[events[dealer_init_str][0]])
+        tr_objects = [trackers[t] for t in dealer_dict['trackers']]
 
         # make the dealer object
         max_lag = dealer_dict['max_lag']
@@ -203,11 +632,11 @@ def reconstruct_dealer(fname):
 
         # force input responses/log data
         dealer_stop_str = 'dealer_' + str(dealer_id) + '_stop'
-        dealer_stop_idx = np.where([r[1] == dealer_stop_str for r in raw])[0]
+        dealer_stop_idx = events.get(dealer_stop_str, [])
         if len(dealer_stop_idx) == 0:
             raise ValueError('TrackerDealer {} has not stopped. All dealers '
                              'must be stopped.'.format(dealer_id))
-        dealer_stop_log = json.loads(raw[dealer_stop_idx[0]][2])
+        dealer_stop_log = json.loads(values[dealer_stop_idx[0]])
 
         shape = tuple(dealer_dict['shape'])
         log_response_history = dealer_stop_log['response_history']
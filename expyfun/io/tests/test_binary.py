@@ -0,0 +1,85 @@
+import os.path as op
+import warnings
+
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+from numpy.testing import assert_array_equal
+
+from expyfun import ExperimentController
+from expyfun.io import read_tab_raw, read_tab_binary, tab_to_binary
+from expyfun.io._binary import _BinaryWriter
+from expyfun._data_writer import _TabWriter
+from expyfun._utils import _TempDir, _hide_window
+
+warnings.simplefilter('always')
+
+tempdir = _TempDir()
+entries = [(0.5, 'trial_id', 'one'), (0.75, 'misc', 'a\tb'),
+           (1., 'misc', None), (1.25, 'trial_ok', r'x\ty'),
+           (2., 'tracker_1_respond', [1, 2])]
+
+
+def _check_same(fname_tab, fname_bin):
+    """Helper to check that .tab and binary reads agree"""
+    raw = read_tab_raw(fname_tab)
+    times, codes, event_types, values = read_tab_binary(fname_bin)
+    assert_array_equal(times, [r[0] for r in raw])
+    assert_equal([event_types[c] for c in codes], [r[1] for r in raw])
+    assert_equal(list(values), [r[2] for r in raw])
+    return times, codes, event_types, values
+
+
+def test_binary_log():
+    """Test writing, reading, and converting binary event logs."""
+    fname_tab = op.join(tempdir, 'test.tab')
+    fname_bin = op.join(tempdir, 'direct.bin')
+    with open(fname_tab, 'w') as fid:
+        fid.write('# %s\n' % dict(participant='foo', session='01'))
+        writer = _TabWriter(fid)
+        writer.write('timestamp', 'event', 'value')
+        bin_writer = _BinaryWriter(fname_bin)
+        for entry in entries:
+            writer.write(*entry)
+            bin_writer.write(*entry)
+        bin_writer.close()
+        bin_writer.write(3., 'closed', None)  # no error
+    times, codes, event_types, values = _check_same(fname_tab, fname_bin)
+    assert_equal(event_types, ['trial_id', 'misc', 'trial_ok',
+                               'tracker_1_respond'])
+    assert_array_equal(codes, [0, 1, 1, 2, 3])
+    assert_equal(values[1], 'a\\tb')
+    assert_true(read_tab_binary(fname_bin, values=False)[3] is None)
+
+    # conversion
+    fname_conv = tab_to_binary(fname_tab)
+    assert_equal(fname_conv, op.join(tempdir, 'test.bin'))
+    assert_raises(IOError, tab_to_binary, fname_tab)
+    fname_conv = tab_to_binary(fname_tab, op.join(tempdir, 'conv.bin'))
+    with open(fname_bin, 'rb') as fid_1:
+        with open(fname_conv, 'rb') as fid_2:
+            assert_equal(fid_1.read(), fid_2.read())
+    _check_same(fname_tab, fname_conv)
+
+    # truncated (e.g., crashed) file
+    with open(fname_bin, 'rb') as fid:
+        data = fid.read()
+    with open(fname_bin, 'wb') as fid:
+        fid.write(data[:-5])
+    assert_equal(len(read_tab_binary(fname_bin)[0]), len(entries) - 1)
+    assert_raises(ValueError, read_tab_binary, fname_tab)
+
+
+@_hide_window
+def test_binary_ec():
+    """Test binary event logs written by ExperimentController."""
+    with ExperimentController('test', output_dir=tempdir, full_screen=False,
+                              window_size=(1, 1), participant='foo',
+                              session='01', stim_db=0.0, noise_db=0.0,
+                              data_binary=True, data_writer='thread',
+                              version='dev') as ec:
+        ec.identify_trial(ec_id='one', ttl_id=[0])
+        ec.start_stimulus()
+        ec.write_data_line('misc', np.arange(3))
+        ec.stop()
+        ec.trial_ok()
+    _check_same(ec.data_fname, op.splitext(ec.data_fname)[0] + '.bin')
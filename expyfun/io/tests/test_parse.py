@@ -1,10 +1,20 @@
-import numpy as np
+import csv
+import os
+import os.path as op
+from threading import Thread
+import time
 import warnings
+
+import numpy as np
 from nose.tools import assert_equal, assert_in, assert_raises, assert_true
+from numpy.testing import assert_array_equal
 
 from expyfun import ExperimentController
-from expyfun.io import read_tab, reconstruct_tracker, reconstruct_dealer
-from expyfun._utils import _TempDir, _hide_window
+from expyfun.io import (read_tab, read_tab_raw, iter_tab, read_tab_many,
+                        reconstruct_tracker, reconstruct_dealer)
+from expyfun.io import _parse
+from expyfun._data_writer import _TabWriter, _open_data_file
+from expyfun._utils import _TempDir, _hide_window, requires_lib
 from expyfun.stimuli import TrackerUD, TrackerBinom, TrackerDealer
 
 warnings.simplefilter('always')
@@ -16,6 +26,203 @@ std_kwargs = dict(output_dir=temp_dir, full_screen=False, window_size=(1, 1),
                   verbose=True, version='dev')
 
 
+def test_read_tab_raw():
+    """Test raw .tab reading."""
+    fname = op.join(temp_dir, 'raw.tab')
+    lines = ['0.5\ttrial_id\tone', '1\tmisc\t[1, 2]', '1.5\tmisc\t"quoted"',
+             '2.25\ttrial_ok\ta\\tb', '3\tmisc\t']
+    for newline in ('\n', '\r\n'):
+        for end in ('', newline):
+            text = newline.join(['# {}', 'timestamp\tevent\tvalue'] + lines)
+            with open(fname, 'wb') as fid:
+                fid.write((text + end).encode())
+            # original csv-based parsing
+            with open(fname, 'r') as fid:
+                want = [(float(line[0]), line[1], line[2]) for line in
+                        list(csv.reader(fid, delimiter='\t'))[2:]]
+            assert_equal(want[2][2], 'quoted')
+            for chunk_size in (7, 2 ** 20):
+                orig_size = _parse._CHUNK_SIZE
+                _parse._CHUNK_SIZE = chunk_size
+                try:
+                    assert_equal(read_tab_raw(fname), want)
+                    times, codes, keys, values = read_tab_raw(
+                        fname, return_arrays=True)
+                finally:
+                    _parse._CHUNK_SIZE = orig_size
+                assert_array_equal(times, [w[0] for w in want])
+                assert_equal(keys, ['trial_id', 'misc', 'trial_ok'])
+                assert_array_equal(codes, [0, 1, 1, 2, 1])
+                assert_equal(list(values), [w[2] for w in want])
+    with open(fname, 'a') as fid:
+        fid.write('4\tmisc\n')
+    assert_raises(ValueError, read_tab_raw, fname)
+
+
+def test_read_tab():
+    """Test .tab segmentation."""
+    fname = op.join(temp_dir, 'segment.tab')
+    lines = ['0\tmisc\tbefore', '1\ttrial_id\tone', '2\tplay\tNone',
+             '3\tmisc\tx', '4\ttrial_ok\tNone', '5\tmisc\tbetween',
+             '6\ttrial_id\ttwo', '7\ttrial_ok\tNone', '8\tmisc\tafter']
+    with open(fname, 'w') as fid:
+        fid.write('\n'.join(['# {}', 'timestamp\tevent\tvalue'] + lines))
+    data = read_tab(fname)
+    assert_equal(data, [
+        dict(trial_id=[('one', 1.)], misc=[('x', 3.)], play=[('None', 2.)],
+             trial_ok=[('None', 4.)]),
+        dict(trial_id=[('two', 6.)], misc=[], play=[],
+             trial_ok=[('None', 7.)])])
+    data = read_tab(fname, group_end=None)
+    assert_equal(data[0]['misc'], [('x', 3.), ('between', 5.)])
+    assert_equal(data[1]['misc'], [('after', 8.)])
+    flat = read_tab(fname, flat=True)
+    assert_array_equal(flat['trial'], [0, 0, 0, 0, 1, 1])
+    assert_array_equal(flat['timestamp'], [1, 2, 3, 4, 6, 7])
+    assert_array_equal(flat['event'], ['trial_id', 'play', 'misc',
+                                       'trial_ok', 'trial_id', 'trial_ok'])
+    assert_array_equal(flat['value'], ['one', 'None', 'x', 'None', 'two',
+                                       'None'])
+
+    # random access
+    assert_true(not op.isfile(fname + '.idx'))
+    for group_end in ('trial_ok', None, 'trial_ok'):
+        want = read_tab(fname, group_end=group_end)
+        assert_equal(read_tab(fname, group_end=group_end, trials=1), want[1:])
+        assert_true(op.isfile(fname + '.idx'))
+        assert_equal(read_tab(fname, group_end=group_end,
+                              trials=slice(None)), want)
+        assert_equal(read_tab(fname, group_end=group_end, trials=[1, 0]),
+                     want[::-1])
+    flat = read_tab(fname, flat=True, trials=[1])
+    assert_array_equal(flat['trial'], [1, 1])
+    assert_array_equal(flat['event'], ['trial_id', 'trial_ok'])
+    assert_raises(IndexError, read_tab, fname, trials=2)
+    with open(fname, 'a') as fid:  # index must be updated
+        fid.write('\n9\ttrial_id\tthree\n10\ttrial_ok\tNone')
+    assert_equal(read_tab(fname, trials=[2])[0]['trial_id'],
+                 [('three', 9.)])
+    with open(fname + '.idx', 'wb') as fid:  # corrupted index
+        fid.write(b'foo')
+    assert_equal(read_tab(fname, trials=[2])[0]['trial_ok'],
+                 [('None', 10.)])
+    with open(fname, 'a') as fid:
+        fid.write('\n11\ttrial_id\tfour\n12\ttrial_id\tfive\n'
+                  '13\ttrial_ok\tNone\n14\ttrial_ok\tNone\n')
+    assert_raises(RuntimeError, read_tab, fname)
+    assert_raises(RuntimeError, read_tab, fname, trials=0)
+
+
+def test_iter_tab():
+    """Test iterating over a .tab file as it is written."""
+    fname = op.join(temp_dir, 'live.tab')
+    header = '# {}\ntimestamp\tevent\tvalue\n'
+    lines = ['0\tmisc\tbefore\n', '1\ttrial_id\tone\n',
+             '2\tplay\tNone\n', '3\ttrial_ok\tNone\n',
+             '4\tmisc\tbetween\n', '5\ttrial_id\ttwo\n',
+             '6\ttrial_ok\tNone\n']
+    with open(fname, 'w') as fid:
+        fid.write(header + ''.join(lines))
+    for group_end in ('trial_ok', None):
+        assert_equal(list(iter_tab(fname, group_end=group_end)),
+                     read_tab(fname, group_end=group_end))
+    assert_raises(ValueError, next, iter_tab(fname, group_end='trial_id'))
+    assert_raises(RuntimeError, list, iter_tab(fname, group_end='misc'))
+
+    # follow a file being written
+    def _write():
+        with open(fname, 'w') as fid:
+            for chunk in (header[:5], header[5:] + lines[0] + lines[1][:3],
+                          lines[1][3:] + lines[2], lines[3] + lines[4],
+                          lines[5], lines[6]):
+                fid.write(chunk)
+                fid.flush()
+                time.sleep(0.02)
+
+    open(fname, 'w').close()
+    thread = Thread(target=_write)
+    thread.start()
+    trials = iter_tab(fname, follow=True, poll=0.005, timeout=0.5)
+    assert_equal(next(trials)['trial_id'], [('one', 1.)])
+    assert_equal(next(trials)['trial_id'], [('two', 5.)])
+    thread.join()
+    assert_raises(StopIteration, next, trials)
+
+
+def test_compressed():
+    """Test reading compressed .tab files."""
+    compressions = [None, 'gzip']
+    try:
+        import zstandard  # noqa
+    except ImportError:
+        pass
+    else:
+        compressions.append('zstd')
+    for compression in compressions:
+        fname = op.join(temp_dir, 'compressed_%s.tab' % compression)
+        fid = _open_data_file(fname, compression)
+        fid.write('# %s\n' % dict(participant='foo', session='01'))
+        writer = _TabWriter(fid)
+        writer.write('timestamp', 'event', 'value')
+        for ti in range(3):
+            writer.write(ti, 'trial_id', ti)
+            writer.write(ti + 0.5, 'trial_ok', None)
+        writer.write(4, 'misc', 'a\tb')
+        writer.flush()
+        # readable before closing (e.g., after a crash)
+        assert_equal(len(read_tab_raw(fname)), 7)
+        writer.close()
+        if compression is None:
+            want = read_tab_raw(fname)
+            want_trials = read_tab(fname)
+            continue
+        assert_equal(read_tab_raw(fname), want)
+        assert_equal(read_tab(fname), want_trials)
+        assert_equal(read_tab(fname, trials=[2, 0]), want_trials[::-1][::2])
+        assert_equal(list(iter_tab(fname)), want_trials)
+        assert_raises(ValueError, next, iter_tab(fname, follow=True))
+        data = read_tab_many([fname])
+        assert_array_equal(data['participant'], ['foo'] * 6)
+
+
+@requires_lib('joblib')
+def test_read_tab_many():
+    """Test reading many .tab files."""
+    fnames = [op.join(temp_dir, 'many_%d.tab' % ii) for ii in range(3)]
+    for ii, fname in enumerate(fnames):
+        with open(fname, 'w') as fid:
+            fid.write('# %s\ntimestamp\tevent\tvalue\n'
+                      % dict(participant='p%d' % ii, session='01'))
+            for ti in range(ii + 1):
+                fid.write('%d\ttrial_id\t%d\n%d.5\ttrial_ok\tNone\n'
+                          % (ti, ti, ti))
+    with open(fnames[2], 'a') as fid:
+        fid.write('9\tmisc\tafter\n')
+    assert_raises(TypeError, read_tab_many, fnames[0])
+    cache_dir = op.join(temp_dir, 'cache')
+    want = None
+    for n_jobs, cache in ((1, None), (2, None), (1, cache_dir), (2, cache_dir),
+                          (1, cache_dir)):
+        data = read_tab_many(fnames, n_jobs=n_jobs, cache_dir=cache)
+        if want is None:
+            want = data
+        assert_equal(set(data.keys()), set(want.keys()))
+        for key in want:
+            assert_array_equal(data[key], want[key])
+    assert_equal(len(os.listdir(cache_dir)), 3)
+    assert_array_equal(want['file'], [0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2])
+    assert_array_equal(want['trial'], [0, 0, 0, 0, 1, 1, 0, 0, 1, 1, 2, 2])
+    assert_array_equal(want['participant'],
+                       ['p0'] * 2 + ['p1'] * 4 + ['p2'] * 6)
+    assert_array_equal(want['session'], ['01'] * 12)
+    assert_array_equal(want['value'][:2], ['0', 'None'])
+    with open(fnames[0], 'a') as fid:  # changed file is read again
+        fid.write('3\ttrial_id\t3\n3.5\ttrial_ok\tNone\n')
+    data = read_tab_many(fnames, cache_dir=cache_dir)
+    assert_equal(len(data['file']), 14)
+    assert_equal(len(os.listdir(cache_dir)), 4)
+
+
 @_hide_window
 def test_parse():
     """Test .tab parsing."""
@@ -47,6 +254,50 @@ def test_parse():
     data = read_tab(ec.data_fname, group_end=None)
     assert_equal(len(data[0]['misc']), 2)  # includes between-trials stuff
     assert_equal(len(data[1]['misc']), 2)
+    flat = read_tab(ec.data_fname, flat=True)
+    assert_array_equal(np.unique(flat['trial']), [0, 1])
+    assert_equal(set(flat['event']), set(keys))
+
+
+def test_reconstruct_many():
+    """Test reconstructing many trackers and dealers from one file."""
+    fname = op.join(temp_dir, 'trackers.tab')
+    with open(fname, 'w') as fid:
+        fid.write('# {}\ntimestamp\tevent\tvalue\n')
+        writer = _TabWriter(fid)
+
+        def callback(event_type, value=None, timestamp=None):
+            writer.write(0. if timestamp is None else timestamp, event_type,
+                         value)
+
+        rng = np.random.RandomState(0)
+        trackers = [TrackerBinom(callback, .05, .5, 10) for _ in range(2)]
+        for tr in trackers:
+            while not tr.stopped:
+                tr.respond(rng.rand() < 0.9)
+        dealers = list()
+        for _ in range(3):
+            tr = [TrackerUD(callback, 1, 1, 3, 1, 5, np.inf, 3)
+                  for _ in range(2)]
+            trackers.extend(tr)
+            dealers.append(TrackerDealer(callback, tr))
+            for _, x_current in dealers[-1]:
+                dealers[-1].respond(rng.rand() < x_current)
+    rec_trackers = reconstruct_tracker(fname)
+    assert_equal(len(rec_trackers), len(trackers))
+    for tr, rec in zip(trackers, rec_trackers):
+        assert_true(rec.stopped)
+        assert_equal(rec._tracker_id, tr._tracker_id)
+        assert_array_equal(rec.responses, tr.responses)
+        assert_array_equal(rec.x, tr.x)
+    rec_dealers = reconstruct_dealer(fname)
+    assert_equal(len(rec_dealers), len(dealers))
+    for td, rec in zip(dealers, rec_dealers):
+        assert_array_equal(td._x_history, rec._x_history)
+        assert_array_equal(td._tracker_history, rec._tracker_history)
+        assert_array_equal(td._response_history, rec._response_history)
+        assert_equal([t._tracker_id for t in td.trackers.ravel()],
+                     [t._tracker_id for t in rec.trackers.ravel()])
 
 
 @_hide_window
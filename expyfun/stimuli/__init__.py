@@ -5,6 +5,7 @@
 from ._hrtf import convolve_hrtf
 from ._mls import compute_mls_impulse_response, repeated_mls
 from ._stimuli import rms, play_sound, window_edges
+from ._resample import resample
 from ._vocoder import vocode, get_band_freqs, get_bands, get_env, get_carriers
 from ._tracker import TrackerUD, TrackerBinom, TrackerDealer
 from .._tdt_controller import get_tdt_rates
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Polyphase resampling."""
+
+from fractions import Fraction
+
+import numpy as np
+
+# (up, down) -> FIR filter, designing these can take longer than filtering
+_filter_cache = dict()
+
+# maximum relative error of the rational approximation to the rate ratio
+_RATIO_TOL = 1e-6
+
+
+def _get_up_down(up, down):
+    """Get a (small) integer up/down pair approximating the ratio"""
+    ratio = float(up) / float(down)
+    for max_den in (100, 1000, 10000):
+        frac = Fraction(ratio).limit_denominator(max_den)
+        if abs(float(frac) / ratio - 1) <= _RATIO_TOL:
+            break
+    return frac.numerator, frac.denominator
+
+
+def _get_filter(up, down):
+    """Get the (cached) anti-aliasing filter for a set of rates"""
+    key = (up, down)
+    if key not in _filter_cache:
+        from scipy.signal import firwin
+        max_rate = max(up, down)
+        half_len = 10 * max_rate  # same as scipy.signal.resample_poly
+        _filter_cache[key] = firwin(2 * half_len + 1, 1. / max_rate,
+                                    window=('kaiser', 5.0))
+    return _filter_cache[key]
+
+
+def resample(x, up=1., down=1., axis=-1):
+    """Resample a signal using polyphase filtering
+
+    Parameters
+    ----------
+    x : array-like
+        The signal to resample.
+    up : float
+        Factor to upsample by (e.g., the new sample rate).
+    down : float
+        Factor to downsample by (e.g., the old sample rate).
+    axis : int
+        The axis along which to resample.
+
+    Returns
+    -------
+    y : array
+        The resampled signal.
+
+    Notes
+    -----
+    The ratio ``up / down`` is approximated by a ratio of integers to within
+    a relative error of 1e-6, and the filter designed for each pair of
+    integers is cached, so resampling repeatedly between the same rates
+    only has to do the filtering.
+    """
+    from scipy.signal import resample_poly
+    x = np.asarray(x)
+    up, down = _get_up_down(up, down)
+    if up == down:
+        return x.copy()
+    return resample_poly(x, up, down, axis=axis, window=_get_filter(up, down))
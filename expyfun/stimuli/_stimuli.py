@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
 """Generic stimulus generation functions."""
 
+import hashlib
 import warnings
 import numpy as np
 from scipy import signal
-from threading import Timer
 
 from ..io import read_wav
-from .._sound_controllers import SoundPlayer
+from .._sound_controllers import _PlayerPool
 from .._utils import wait_secs, string_types
 
+# players and converted sounds are reused across play_sound calls
+_player_pool = _PlayerPool()
+
 
 def window_edges(sig, fs, dur=0.01, axis=-1, window='hann', edges='both'):
     """Window the edges of a signal (e.g., to prevent "pops")
@@ -101,33 +104,42 @@ def play_sound(sound, fs=None, norm=True, wait=False):
     -------
     snd : instance of SoundPlayer
         The object playing sound. Can use "stop" to stop playback. Note that
-        the sound player will be cleared/deleted once the sound finishes
-        playing.
+        the sound player will be reused by later calls once the sound
+        finishes playing (or is stopped).
+
+    Notes
+    -----
+    Up to 8 sounds can play at once (starting a ninth stops the one started
+    longest ago), and the 32 most recently played sounds are kept in the
+    output format, so playing them again is quick.
     """
-    sound = np.array(sound)
     fs_in = 44100
     if isinstance(sound, string_types):
         sound, fs_in = read_wav(sound)
+    sound = np.array(sound)
     if fs is None:
         fs = fs_in
-    if sound.ndim == 1:  # make it stereo
-        sound = np.array((sound, sound))
-    if sound.ndim != 2:
+    if sound.ndim not in (1, 2):
         raise ValueError('sound must be 1- or 2-dimensional')
-    if norm:
-        m = np.abs(sound).max() * 1.000001
-        m = m if m != 0 else 1
-        sound /= m
-    if np.abs(sound).max() > 1.:
-        warnings.warn('Sound exceeds +/-1, will clip')
-    snd = SoundPlayer(sound, fs)
-    dur = sound.shape[1] / float(fs)
-    snd.play()  # will clip as necessary
-    del_wait = 0.5
+    key = (hashlib.sha1(np.ascontiguousarray(sound)).hexdigest(),
+           sound.shape, sound.dtype.str, fs, bool(norm))
+
+    def _prepare():
+        data = sound
+        if data.ndim == 1:  # make it stereo
+            data = np.array((data, data))
+        if norm:
+            m = np.abs(data).max() * 1.000001
+            m = m if m != 0 else 1
+            data = data / m
+        if np.abs(data).max() > 1.:
+            warnings.warn('Sound exceeds +/-1, will clip')
+        return data
+
+    # converting only happens for sounds that are not cached
+    source = _player_pool.get_source(key, _prepare, fs)
+    snd = _player_pool.get_player(source, fs)
+    snd.play()
     if wait:
-        wait_secs(dur)
-    else:
-        del_wait += dur
-    if hasattr(snd, 'delete'):  # for backward compatibility
-        Timer(del_wait, snd.delete).start()
+        wait_secs(source._duration)
     return snd
@@ -205,7 +205,8 @@ class TrackerUD(object):
             change_indices=[int(s) for s in self._change_indices],
             change_rule=self._change_rule,
             x_min=self._x_min,
-            x_max=self._x_max)))
+            x_max=self._x_max,
+            repeat_limit=self._repeat_limit)))
 
     def respond(self, correct):
         """Update the tracker based on the last response.
@@ -303,6 +304,65 @@ class TrackerUD(object):
                     reversals=[int(s) for s in self._reversals],
                     x=[float(s) for s in self._x])))
 
+    def _restore(self, log):
+        """Restore the stopped state from a ``tracker_ID_stop`` log entry
+
+        This is equivalent to (but much faster than) passing each of the
+        logged responses to :meth:`respond`.
+        """
+        responses = np.array(log['responses'], bool)
+        self._reversals = np.array(log['reversals'], int)
+        self._x = np.array(log['x'], float)
+        n_trials = len(responses)
+        if len(self._reversals) != n_trials or len(self._x) != n_trials:
+            raise ValueError('Tracker {} has inconsistent stop log'
+                             ''.format(self._tracker_id))
+        self._responses = responses
+        self._n_trials = n_trials
+        if n_trials == 0:
+            return
+        self._n_reversals = int(self._reversals.max())
+
+        # position of each response within its run of (in)correct responses
+        starts = np.concatenate([[True], responses[1:] != responses[:-1]])
+        run_start = np.where(starts)[0][np.cumsum(starts) - 1]
+        run_pos = np.arange(n_trials) - run_start + 1
+        step_dir = np.zeros(n_trials, int)
+        step_dir[responses & (run_pos % self._down == 0)] = -1
+        step_dir[~responses & (run_pos % self._up == 0)] = 1
+        self._n_down = int(run_pos[-1] % self._down) if responses[-1] else 0
+        self._n_up = 0 if responses[-1] else int(run_pos[-1] % self._up)
+        steps = np.where(step_dir)[0]
+        self._direction = int(step_dir[steps[-1]]) if len(steps) else 0
+
+        # recompute the step sizes that were used (before any limiting)
+        if self._change_rule.lower() == 'reversals':
+            dir_reversal = np.zeros(n_trials, int)
+            dir_reversal[steps[1:]] = np.diff(step_dir[steps]) != 0
+            n_change = np.concatenate(
+                [[0], np.maximum.accumulate(self._reversals)[:-1]])
+            n_change += dir_reversal
+        else:
+            n_change = np.arange(1, n_trials + 1)
+        if np.array_equal(self._change_indices, [0]):
+            step_index = np.zeros(n_trials, int)
+        else:
+            # one past the last change index that has been reached
+            mask = n_change[:, np.newaxis] >= self._change_indices
+            last = mask.shape[1] - np.argmax(mask[:, ::-1], axis=1)
+            step_index = np.where(mask.any(axis=1), last, 0)
+        x_new = self._x.copy()
+        down, up = step_dir < 0, step_dir > 0
+        x_new[down] -= self._step_size_down[step_index[down]]
+        x_new[up] += self._step_size_up[step_index[up]]
+        limited = (x_new < self._x_min) | (x_new > self._x_max)
+        bound = (self._x == self._x_min) | (self._x == self._x_max)
+        self._limit_count = int(limited.sum())
+        self._bad_reversals = bound & limited
+        self._x_current = self._x[-1]
+        self._stop_here()  # warn about limits, as respond would
+        self._stopped = True
+
     def check_valid(self, n_reversals):
         """If last reversals contain reversals exceeding x_min or x_max.
 
@@ -673,6 +733,26 @@ class TrackerBinom(object):
         else:
             self._callback('tracker_%i_respond' % self._tracker_id, correct)
 
+    def _restore(self, log):
+        """Restore the stopped state from a ``tracker_ID_stop`` log entry
+
+        This is equivalent to (but much faster than) passing each of the
+        logged responses to :meth:`respond`.
+        """
+        self._responses = np.array(log['responses'], bool)
+        self._n_trials = len(self._responses)
+        self._n_correct = int(self._responses.sum())
+        self._n_wrong = self._n_trials - self._n_correct
+        if self._n_trials > 0:
+            self._pc = float(self._n_correct) / self._n_trials
+            self._p_val = binom.cdf(self._n_wrong, self._n_trials,
+                                    1 - self._chance)
+            self._min_p_val, self._max_p_val = binom.cdf(
+                [self._n_wrong,
+                 self._n_wrong + (self._max_trials - self._n_trials)],
+                self._max_trials, 1 - self._chance)
+        self._stopped = True
+
     # =========================================================================
     # Define all the public properties
     # =========================================================================
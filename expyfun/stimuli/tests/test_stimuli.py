@@ -9,7 +9,7 @@ from scipy.signal import butter, lfilter
 
 from expyfun._utils import _TempDir, requires_lib, _hide_window
 from expyfun.stimuli import (rms, play_sound, convolve_hrtf, window_edges,
-                             vocode, texture_ERB)
+                             vocode, texture_ERB, resample)
 
 warnings.simplefilter('always')
 
@@ -139,3 +139,34 @@ def test_rms():
     sin = np.sin(2 * np.pi * 1000 * np.arange(10000, dtype=float) / 10000.)
     assert_array_almost_equal(rms(sin), 1. / np.sqrt(2))
     assert_array_almost_equal(rms(np.ones((100, 2)) * 2, 0), [2, 2])
+
+
+def test_resample():
+    """Test polyphase resampling."""
+    from expyfun.stimuli import _resample
+    from scipy.signal import resample_poly
+    fs_in = 24414.0625
+    t = np.arange(int(fs_in)) / fs_in
+    x = np.array([np.sin(2 * np.pi * 1000 * t), np.cos(2 * np.pi * 500 * t)])
+    assert_equal(_resample._get_up_down(44100, fs_in), (15623, 8649))
+    assert_equal(_resample._get_up_down(48000, fs_in), (1565, 796))
+    for fs_out in (44100., 48000., 16000.):
+        up, down = _resample._get_up_down(fs_out, fs_in)
+        assert_true(abs(up / float(down) * fs_in / fs_out - 1) <= 1e-6)
+        y = resample(x, fs_out, fs_in)
+        assert_true((up, down) in _resample._filter_cache)
+        assert_allclose(y, resample_poly(x, up, down, axis=-1), atol=1e-12)
+        # same signal, new rate
+        t_out = np.arange(y.shape[1]) / fs_out
+        want = [np.sin(2 * np.pi * 1000 * t_out),
+                np.cos(2 * np.pi * 500 * t_out)]
+        sl = slice(100, -100)  # edge effects
+        # passband ripple and rate approximation error
+        assert_allclose(y[:, sl], np.array(want)[:, sl], atol=1e-2)
+        assert_allclose(resample(x.T, fs_out, fs_in, axis=0), y.T)
+    # integer rates
+    y = resample(x[0], 2, 1)
+    assert_equal(y.shape, (2 * x.shape[1],))
+    y = resample(x[0], 1, 1)
+    assert_array_equal(y, x[0])
+    assert_true(y is not x[0])
@@ -3,7 +3,8 @@ import matplotlib
 matplotlib.use('Agg')  # noqa
 from expyfun.stimuli import TrackerUD, TrackerBinom, TrackerDealer
 from expyfun import ExperimentController
-from nose.tools import assert_raises, assert_equal
+from nose.tools import assert_raises, assert_equal, assert_true
+from numpy.testing import assert_array_equal
 from expyfun._utils import _hide_window, requires_opengl21
 import warnings
 
@@ -130,6 +131,58 @@ def test_tracker_ud():
                    change_indices=[2, 4], change_rule='reversals')
 
 
+def test_tracker_restore():
+    """Test restoring trackers from their stop logs"""
+    import json
+    rng = np.random.RandomState(0)
+    kwargs = [dict(),
+              dict(x_min=-1, x_max=1),
+              dict(x_min=-1, x_max=1, repeat_limit='ignore'),
+              dict(change_indices=[2, 4], change_rule='reversals'),
+              dict(change_indices=[4, 8], change_rule='trials', x_min=-2)]
+    for kw in kwargs:
+        for up, down in ((1, 1), (1, 3), (2, 1)):
+            logs = list()
+
+            def log(event_type, value=None, timestamp=None):
+                logs.append((event_type, value))
+
+            step_up = step_down = 0.5
+            if 'change_indices' in kw:
+                step_up, step_down = [1, 0.5, 0.25], [0.75, 0.5, 0.125]
+            trs = list()
+            with warnings.catch_warnings(record=True):
+                tr = TrackerUD(log, up, down, step_up, step_down, 8, 40, 0.,
+                               **kw)
+                while not tr.stopped:
+                    tr.respond(rng.rand() < 0.7)
+                init, stop = [json.loads(v) for e, v in logs
+                              if e.endswith(('_init', '_stop'))]
+                for restore in (False, True):
+                    trs.append(TrackerUD(**init))
+                    if restore:
+                        trs[-1]._restore(stop)
+                    else:
+                        for r in stop['responses']:
+                            trs[-1].respond(r)
+            assert_true(trs[1].stopped)
+            for key, val in vars(trs[0]).items():
+                if key not in ('_tracker_id', '_n_change'):
+                    assert_array_equal(val, getattr(trs[1], key), key)
+    assert_raises(ValueError, trs[1]._restore,
+                  dict(responses=[1], reversals=[], x=[]))
+
+    tr = TrackerBinom(None, 0.05, 0.5, 20)
+    for r in [1, 0, 1, 1, 1, 1, 1, 1]:
+        tr.respond(r)
+    assert_true(tr.stopped)
+    restored = TrackerBinom(None, 0.05, 0.5, 20)
+    restored._restore(dict(responses=[1, 0, 1, 1, 1, 1, 1, 1]))
+    for key, val in vars(tr).items():
+        if key not in ('_tracker_id', '_callback'):
+            assert_array_equal(val, getattr(restored, key), key)
+
+
 @_hide_window
 @requires_opengl21
 def test_tracker_binom():
@@ -0,0 +1,58 @@
+import os.path as op
+import warnings
+
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+
+from expyfun._data_writer import _TabWriter, _ThreadedWriter
+from expyfun._utils import _TempDir
+
+warnings.simplefilter('always')
+
+tempdir = _TempDir()
+
+
+def test_threaded_writer():
+    """Test that the threaded data writer gives identical output."""
+    contents = list()
+    for kind in ('direct', 'thread'):
+        value = [1, 2]
+        entries = [(0.5, 'foo', None), (1.25, 'bar', 'bar\tbar'),
+                   (1.5, 'bar2', r'bar\tbar'), (2., 'list', value),
+                   (np.float64(2.5), 'np', np.arange(3)), (3, u'\xe9', 'x')]
+        fname = op.join(tempdir, kind + '.tab')
+        writer = _TabWriter(open(fname, 'w'))
+        if kind == 'thread':
+            writer = _ThreadedWriter(writer)
+        for ei, entry in enumerate(entries):
+            writer.write(*entry)
+            if ei == 2:
+                writer.flush()
+                with open(fname, 'rb') as fid:
+                    assert_equal(len(fid.readlines()), 3)
+        # mutating after the write must not change what ends up in the file
+        value.append(3)
+        writer.close()
+        writer.write(4., 'closed', None)  # silently ignored
+        writer.flush()
+        with open(fname, 'rb') as fid:
+            contents.append(fid.read())
+    assert_equal(contents[0], contents[1])
+    assert_equal(len(contents[0].splitlines()), len(entries))
+
+
+def test_threaded_writer_error():
+    """Test that errors in the writer thread are not lost."""
+    fname = op.join(tempdir, 'error.tab')
+    tab_writer = _TabWriter(open(fname, 'w'))
+    writer = _ThreadedWriter(tab_writer)
+    writer.write(0., 'foo', None)
+    writer.flush()
+    tab_writer.fid.close()  # writing to it now fails
+    tab_writer.write = lambda *args: tab_writer.fid.write('x')
+    writer.write(1., 'bar', None)
+    writer._thread.join(5.)
+    assert_true(not writer._thread.is_alive())
+    assert_raises(ValueError, writer.write, 2., 'bar', None)
+    assert_raises(ValueError, writer.flush)
+    assert_raises(ValueError, writer.close)
@@ -1,13 +1,17 @@
 from copy import deepcopy
 from functools import partial
+import os.path as op
 import warnings
 
 import numpy as np
 from nose.tools import assert_raises, assert_true, assert_equal
 from nose.plugins.skip import SkipTest
-from numpy.testing import assert_allclose
+from numpy.testing import assert_allclose, assert_array_equal
 
-from expyfun import ExperimentController, wait_secs, visual
+from expyfun import (ExperimentController, wait_secs, visual,
+                     register_trigger_backend)
+from expyfun.io import read_tab_raw, write_wav
+from expyfun._trigger_controllers import _trigger_backends
 from expyfun._utils import (_TempDir, _hide_window, fake_button_press,
                             fake_mouse_click, requires_opengl21)
 from expyfun.stimuli import get_tdt_rates
@@ -66,12 +70,26 @@ def test_data_line():
     temp_dir = _TempDir()
     these_kwargs = deepcopy(std_kwargs)
     these_kwargs['output_dir'] = temp_dir
-    with ExperimentController(*std_args, stim_fs=44100, **these_kwargs) as ec:
-        for ent in entries:
-            ec.write_data_line(*ent)
-        fname = ec._data_file.name
-    with open(fname) as fid:
+    assert_raises(ValueError, ExperimentController, *std_args,
+                  data_writer='foo', **these_kwargs)
+    assert_raises(ValueError, ExperimentController, *std_args,
+                  data_compression='foo', **these_kwargs)
+    fnames = list()
+    for data_writer in ('thread', 'direct'):
+        with ExperimentController(*std_args, stim_fs=44100,
+                                  data_writer=data_writer,
+                                  **these_kwargs) as ec:
+            for ent in entries:
+                ec.write_data_line(*ent)
+            fnames.append(ec._data_file.name)
+        ec.write_data_line('foo')  # okay after closing, but not written
+    with open(fnames[0]) as fid:
+        lines_thread = fid.readlines()
+    with open(fnames[1]) as fid:
         lines = fid.readlines()
+    # same events in the same order (timestamps can differ)
+    assert_equal([line.split('\t')[1:] for line in lines_thread[1:]],
+                 [line.split('\t')[1:] for line in lines[1:]])
     # check the header
     assert_equal(len(lines), len(entries) + 4)  # header, colnames, flip, stop
     assert_equal(lines[0][0], '#')  # first line is a comment
@@ -96,6 +114,16 @@ def test_data_line():
         assert_equal(outs[1], ent[0])
         # check values
         assert_equal(outs[2], gv)
+    # compressed file
+    with ExperimentController(*std_args, stim_fs=44100,
+                              data_compression='gzip', **these_kwargs) as ec:
+        for ent in entries:
+            ec.write_data_line(*ent)
+        ec.flush()
+        assert_true(ec.data_fname.endswith('.tab.gz'))
+        assert_equal(len(read_tab_raw(ec.data_fname)), len(entries) + 1)
+    assert_equal([line[1:] for line in read_tab_raw(ec.data_fname)],
+                 [line[1:] for line in read_tab_raw(fnames[1])])
     # make sure we got monotonically increasing timestamps
     ts = np.array(ts)
     assert_true(np.all(ts[1:] >= ts[:-1]))
@@ -148,6 +176,53 @@ def test_ec(ac=None, rd=None):
                       audio_controller='pyglet', trigger_controller='foo',
                       stim_fs=44100, **std_kwargs)
 
+        # test the file-backed trigger controller
+        fname = op.join(_TempDir(), 'triggers.bin')
+        with ExperimentController(*std_args, audio_controller='pyglet',
+                                  trigger_controller=dict(type='file',
+                                                          fname=fname),
+                                  stim_fs=44100, **std_kwargs) as ec:
+            ec.identify_trial(ec_id='', ttl_id=[0, 1])
+            ec.start_stimulus(flip=False)
+            ec.stop()
+            ec.trial_ok()
+            # the onset trigger waits for a trial ID stamped in the background
+            ec.identify_trial(ec_id='', ttl_id=dict(id_=[0, 1],
+                                                    wait_for_last=False))
+            ec.start_stimulus(flip=False)
+            ec.stop()
+            ec.trial_ok()
+            ec.stamp_triggers([2, 4], wait_for_last=False).wait(1.)
+        trigs = np.fromfile(fname, [('time', '<f8'), ('trigger', '<u4')])
+        assert_array_equal(trigs['trigger'], [4, 8, 1, 4, 8, 1, 2, 4])
+        assert_true(np.all(np.diff(trigs['time']) > 0.02))
+        assert_allclose(np.diff(trigs['time'][3:6]), 0.03, atol=0.01)
+
+        # trigger controllers that only have the needed methods
+        class PlainTrigger(object):
+            def __init__(self):
+                self.stamped = list()
+
+            def stamp_triggers(self, triggers, delay=0.03,
+                               wait_for_last=True):
+                self.stamped.extend(triggers)
+
+            def close(self):
+                pass
+        plain = PlainTrigger()
+        register_trigger_backend('plain', lambda ec, params: plain)
+        try:
+            with ExperimentController(*std_args, audio_controller='pyglet',
+                                      trigger_controller='plain',
+                                      stim_fs=44100, **std_kwargs) as ec:
+                ec.identify_trial(ec_id='', ttl_id=[0, 1])
+                ec.start_stimulus(flip=False)
+                ec.stop()
+                ec.trial_ok()
+        finally:
+            del _trigger_backends['plain']
+        assert_equal(plain.stamped, [4, 8, 1])
+
         # test value checking for RMS checker
         assert_raises(ValueError, ExperimentController, *std_args,
                       audio_controller='pyglet', check_rms=True, stim_fs=44100,
@@ -176,6 +251,19 @@ def test_ec(ac=None, rd=None):
                                       stim_fs=100., suppress_resamp=suppress,
                                       **std_kwargs) as ec:
                 pass
+        with ExperimentController(*std_args, audio_controller=this_ac,
+                                  response_device=this_rd,
+                                  trigger_controller=this_tc,
+                                  stim_fs=100., resample_cache=True,
+                                  check_rms=None, **std_kwargs) as ec:
+            x = np.sin(np.arange(100) / 10.) / 2.
+            ec.load_buffer(x)
+            assert_equal(len(ec._resample_cache), 1)
+            ec.load_buffer(x)
+            ec.load_buffer(x.astype(np.float32))  # same content
+            assert_equal(len(ec._resample_cache), 1)
+            ec.load_buffer(x[::-1])
+            assert_equal(len(ec._resample_cache), 2)
     warnings.simplefilter('ignore')  # ignore dummy TDT warning
     with ExperimentController(*std_args, audio_controller=this_ac,
                               response_device=this_rd,
@@ -263,6 +351,69 @@ def test_ec(ac=None, rd=None):
             ec.load_buffer(noise)
             assert_equal(len(w), 3)
 
+        # test preloaded stimuli
+        ec.set_rms_checking(None)
+        assert_raises(TypeError, ec.preload_stimuli, [click])
+        assert_raises(TypeError, ec.preload_stimuli, {1: click})
+        assert_raises(ValueError, ec.preload_stimuli, dict(a=click),
+                      max_bytes=-1)
+        assert_raises(ValueError, ec.preload_stimuli, dict(bad=2 * click))
+        assert_raises(KeyError, ec.load_buffer, 'bad')
+        nbytes = ec.preload_stimuli(dict(click=click, noise=noise))
+        assert_true(nbytes > 0)
+        assert_equal(list(ec._stim_prepared), ['click', 'noise'])
+        ec.load_buffer('click')
+        assert_equal(list(ec._stim_prepared), ['noise', 'click'])
+        assert_raises(KeyError, ec.load_buffer, 'foo')
+        # only one fits, so the least recently used gets discarded
+        ec.preload_stimuli(dict(), max_bytes=nbytes // 2 + 1)
+        assert_equal(list(ec._stim_prepared), ['click'])
+        ec.load_buffer('noise')  # prepared again
+        assert_equal(list(ec._stim_prepared), ['noise'])
+        ec.preload_stimuli(dict(click=click))  # keeps the limit
+        assert_equal(list(ec._stim_prepared), ['click'])
+        ec.load_buffer('noise')
+        assert_equal(list(ec._stim_prepared), ['noise'])
+        ec.preload_stimuli(dict(), max_bytes=np.inf)  # no limit
+        assert_true(ec._stim_max_bytes is None)
+        ec.load_buffer('click')
+        assert_equal(list(ec._stim_prepared), ['noise', 'click'])
+        ec.preload_stimuli(dict(), max_bytes=nbytes // 2 + 1)
+        assert_equal(list(ec._stim_prepared), ['click'])
+        ec.load_buffer('noise')
+        buf = ec._stim_prepared['noise'][0]
+        ec.load_buffer('noise')
+        assert_true(ec._stim_prepared['noise'][0] is buf)
+        ec.set_stim_db(ec.stim_db - 6)
+        ec.load_buffer('noise')  # level changed, so prepared again
+        assert_true(ec._stim_prepared['noise'][0] is not buf)
+        ec.set_stim_db(ec.stim_db + 6)
+
+        # test streaming
+        fname = op.join(_TempDir(), 'stream.wav')
+        with warnings.catch_warnings(record=True):  # fs cast to int
+            write_wav(fname, noise, ec.fs)
+        ec.load_stream(fname)
+        ec.play()
+        assert_raises(RuntimeError, ec.load_stream, fname)
+        ec.stop()
+        with warnings.catch_warnings(record=True):
+            write_wav(fname, noise, ec.fs / 2., overwrite=True)
+        assert_raises(ValueError, ec.load_stream, fname)
+
+        # test queueing
+        ec.load_buffer(click)
+        ec.queue_buffer(click)
+        ec.queue_buffer('noise')  # preloaded
+        assert_allclose(ec._queue_onsets, [len(click) / ec.fs,
+                                           2 * len(click) / ec.fs], rtol=1e-4)
+        ec.play()
+        ec.queue_buffer(click)  # while playing
+        assert_equal(len(ec._queue_onsets), 3)
+        ec.stop()
+        ec.load_buffer(click)
+        assert_equal(ec._queue_onsets, [])
+
         ec.stop()
         ec.set_visible()
         ec.set_visible(False)
@@ -0,0 +1,255 @@
+import os
+import os.path as op
+
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+from numpy.testing import assert_allclose, assert_array_equal
+
+from expyfun import _sound_controllers
+from expyfun._sound_controllers import (_as_static, PygletSoundController,
+                                        _get_noise, WavStreamSource,
+                                        _PlayerPool)
+from expyfun._utils import _TempDir
+from expyfun.io import read_wav, write_wav
+
+tempdir = _TempDir()
+
+
+def _as_static_ref(data):
+    """Reference (single-pass) quantization"""
+    data = np.array(data.T, np.float64).ravel('C')
+    data[data < -1] = -1
+    data[data > 1] = 1
+    return (data * (2 ** 15)).astype('int16').tobytes()
+
+
+def test_as_static():
+    """Test blockwise quantization of audio data."""
+    rng = np.random.RandomState(0)
+    orig_block = _sound_controllers._QUANT_BLOCK
+    _sound_controllers._QUANT_BLOCK = 7  # force several (partial) blocks
+    try:
+        for shape in ((50,), (1, 50), (2, 50), (2, 7), (2, 1)):
+            for dtype in (np.float32, np.float64):
+                data = (3 * (rng.rand(*shape) - 0.5)).astype(dtype)
+                data.flat[:3] = [-1, 1, 0]
+                orig = data.copy()
+                source = _as_static(data, 44100)
+                assert_equal(source._file.getvalue(), _as_static_ref(data))
+                assert_equal(source.audio_format.channels,
+                             1 if data.ndim == 1 else data.shape[0])
+                # the input must not be modified
+                assert np.array_equal(data, orig)
+    finally:
+        _sound_controllers._QUANT_BLOCK = orig_block
+    assert_raises(ValueError, _as_static, np.zeros((1, 1, 1)), 44100)
+
+
+def test_noise_level():
+    """Test that lowering the noise level does not re-quantize the noise."""
+    calls = list()
+
+    def _as_static_count(data, fs):
+        calls.append(data.shape)
+        return _as_static(data, fs)
+
+    _sound_controllers._as_static = _as_static_count
+    try:
+        ac = PygletSoundController(None, 24414.)
+        try:
+            assert_equal(len(calls), 1)  # noise is only made when needed
+            assert ac._noise_array is None
+            ac.set_noise_level(0.1)
+            assert_equal(len(calls), 1)
+            ac.start_noise()
+            assert_equal(len(calls), 2)
+            noise = ac.noise
+            for level in (0.05, 0.1, 0.):
+                ac.set_noise_level(level)
+                assert_equal(ac.noise.volume, level / 0.1)
+            assert_equal(len(calls), 2)
+            assert ac.noise is noise
+            assert ac._noise_playing
+            # louder needs a new player
+            ac.set_noise_level(0.2)
+            assert_equal(len(calls), 3)
+            assert ac.noise is not noise
+            assert_equal(ac.noise.volume, 1.)
+            assert ac._noise_playing
+        finally:
+            ac.halt()
+    finally:
+        _sound_controllers._as_static = _as_static
+
+
+def test_noise_cache():
+    """Test caching of masker noise."""
+    noise = _get_noise(1000., 2., seed=1)
+    assert_equal(noise.shape, (2000,))
+    assert_allclose(np.sqrt(np.mean(noise * noise)), 1.)
+    assert_array_equal(noise, _get_noise(1000., 2., seed=1))
+    assert_true(not np.array_equal(noise, _get_noise(1000., 2., seed=2)))
+    cache_dir = op.join(tempdir, 'noise')
+    cached = _get_noise(1000., 2., cache_dir=cache_dir)  # seed 0
+    assert_array_equal(cached, _get_noise(1000., 2., seed=0))
+    fnames = os.listdir(cache_dir)
+    assert_equal(len(fnames), 1)
+    # it gets loaded from disk
+    fname = op.join(cache_dir, fnames[0])
+    np.save(fname, np.ones(2000))
+    assert_array_equal(_get_noise(1000., 2., cache_dir=cache_dir), 1.)
+    # other keys do not
+    assert_array_equal(_get_noise(1000., 2., 1, cache_dir), noise)
+    assert_true(not np.array_equal(_get_noise(1000., 1., 1, cache_dir)[:1000],
+                                   noise[:1000]))
+    assert_equal(len(os.listdir(cache_dir)), 3)
+    # broken files get replaced
+    with open(fname, 'wb') as fid:
+        fid.write(b'foo')
+    assert_array_equal(_get_noise(1000., 2., cache_dir=cache_dir), cached)
+    assert_array_equal(np.load(fname), cached)
+
+
+def test_wav_stream():
+    """Test streaming WAV data."""
+    from scipy.io import wavfile
+    rng = np.random.RandomState(0)
+    fs = 24414
+    scale = 0.7
+    for ch, dtype in ((1, np.int16), (2, np.int16), (2, np.float32)):
+        x = (rng.rand(ch, 1000) - 0.5) * 1.9
+        fname = op.join(tempdir, 'stream.wav')
+        write_wav(fname, x, fs, dtype=dtype, overwrite=True)
+        # what load_buffer would play
+        data = read_wav(fname)[0].astype(np.float32)
+        data = np.tile(data, (2 // ch, 1)) * np.float32(scale)
+        want = _as_static(data, fs)._file.getvalue()
+        source = WavStreamSource(wavfile.read(fname, mmap=True)[1], fs, scale)
+        assert_equal(source.audio_format.channels, 2)
+        assert_allclose(source.duration, 1000. / fs)
+        for n_bytes in (4, 100, 401, 10000):
+            source.seek(0.)
+            chunks = list()
+            while True:
+                audio = source.get_audio_data(n_bytes)
+                if audio is None:
+                    break
+                assert_allclose(audio.timestamp,
+                                sum(len(c) for c in chunks) / 4. / fs)
+                chunks.append(audio.data)
+            assert_equal(b''.join(chunks), want)
+        source.seek(500. / fs)
+        assert_equal(source.get_audio_data(40).data, want[2000:2040])
+        source.seek(-1.)
+        assert_equal(source.get_audio_data(4).data, want[:4])
+        source.seek(1.)
+        assert_true(source.get_audio_data(4) is None)
+    ac = PygletSoundController(None, fs)
+    try:
+        ac.load_stream(wavfile.read(fname, mmap=True)[1], scale)
+        assert_true(isinstance(ac.audio.source, WavStreamSource))
+        ac.audio.play()
+        ac.stop()
+    finally:
+        ac.halt()
+
+
+def test_queue():
+    """Test queueing sources for gapless playback."""
+    fs = 24414.
+    ac = PygletSoundController(None, fs)
+    try:
+        tokens = [np.full((n, 2), 0.1 * ii, np.float32)
+                  for ii, n in enumerate((100, 200, 300))]
+        ac.load_buffer(tokens[0])
+        onsets = [ac._queue_prepared(ac._prepare_buffer(t)[0])
+                  for t in tokens[1:]]
+        assert_allclose(onsets, [100. / fs, 300. / fs])
+        assert_allclose(ac.audio._ec_duration, 600. / fs)
+        assert_equal(len(ac.audio._ec_group._sources), 3)
+        # the data are played back to back
+        group = ac.audio._ec_group
+        data = list()
+        while True:
+            audio = group.get_audio_data(1000)
+            if audio is None:
+                break
+            data.append(audio.data)
+        want = _as_static(np.concatenate(tokens).T, fs)._file.getvalue()
+        assert_equal(b''.join(data), want)
+        assert_equal(len(group._sources), 1)
+        # stopping starts over with all of them
+        ac.stop()
+        assert_equal(len(ac.audio._ec_group._sources), 3)
+        assert_allclose(ac.audio._ec_duration, 600. / fs)
+        assert_true(not ac.playing)
+        # loading a new buffer drops them
+        ac.load_buffer(tokens[0])
+        assert_equal(len(ac.audio._ec_group._sources), 1)
+        # a prepared (e.g., preloaded) source can be used several times
+        source = ac._prepare_buffer(tokens[2])[0]
+        ac._load_prepared(source)
+        ac._queue_prepared(source)
+        ac._queue_prepared(source)
+        assert_allclose(ac.audio._ec_duration, 900. / fs)
+        group = ac.audio._ec_group
+        n_bytes = 0
+        while True:
+            audio = group.get_audio_data(1000)
+            if audio is None:
+                break
+            n_bytes += len(audio.data)
+        assert_equal(n_bytes, 3 * 300 * 4)
+    finally:
+        ac.halt()
+
+
+def test_player_pool():
+    """Test recycling of players and converted sounds."""
+    fs = 24414.
+    calls = list()
+
+    def _make(data):
+        def make_data():
+            calls.append(data)
+            return data
+        return make_data
+
+    pool = _PlayerPool(n_players=2, n_sounds=2)
+    try:
+        # long enough not to finish during the test
+        sounds = [np.full((2, 10000), 0.1 * ii) for ii in range(3)]
+        src = pool.get_source('a', _make(sounds[0]), fs)
+        src_2 = pool.get_source('a', _make(sounds[0]), fs)
+        assert_equal(len(calls), 1)
+        assert_true(src is not src_2)  # separate read positions
+        assert_equal(src._file.getvalue(),
+                     _as_static(sounds[0], fs)._file.getvalue())
+        pool.get_source('b', _make(sounds[1]), fs)
+        pool.get_source('a', _make(sounds[0]), fs)  # 'b' is now the oldest
+        pool.get_source('c', _make(sounds[2]), fs)
+        assert_equal(list(pool._sounds.keys()), ['a', 'c'])
+        assert_equal(len(calls), 3)
+        # free players get reused, busy ones do not
+        player = pool.get_player(src, fs)
+        assert_true(pool.get_player(src_2, fs) is player)
+        player.play()
+        player_2 = pool.get_player(pool.get_source('a', None, fs), fs)
+        assert_true(player_2 is not player)
+        assert_true(not player_2.playing)
+        player_2.play()
+        # when all are busy, the one started longest ago is taken over
+        src_3 = pool.get_source('c', None, fs)
+        assert_true(pool.get_player(src_3, fs) is player)
+        assert_true(player.source is src_3)
+        assert_true(not player.playing)
+        assert_equal(len(pool._players), 2)
+        # even deleted players can be reused
+        player.delete()
+        player_3 = pool.get_player(src, fs)
+        assert_true(player_3 is player)
+        assert_true(player.source is src)
+    finally:
+        pool.clear()
+    assert_equal(len(pool._players), 0)
+    assert_equal(len(pool._sounds), 0)
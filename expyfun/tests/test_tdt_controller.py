@@ -0,0 +1,262 @@
+from threading import Event, Thread, current_thread
+import time
+import warnings
+
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+from numpy.testing import assert_array_equal
+
+from expyfun import _tdt_controller
+from expyfun._tdt_controller import TDTController
+
+warnings.simplefilter('always')
+
+
+def _record_writes(tdt):
+    """Keep what gets written to the (dummy) buffers"""
+    rpcox = tdt.rpcox._rpcox
+    bufs = dict(datainleft=np.zeros(10000, np.float32),
+                datainright=np.zeros(10000, np.float32))
+    orig = rpcox.WriteTagVEX
+
+    def write(name, offset, kind, data):
+        bufs[name][offset:offset + len(data)] = data
+        return orig(name, offset, kind, data)
+    rpcox.WriteTagVEX = write
+    return rpcox, bufs
+
+
+def test_tdt_upload():
+    """Test uploading to the TDT in the background."""
+    with warnings.catch_warnings(record=True):  # dummy mode
+        assert_raises(ValueError, TDTController,
+                      dict(TYPE='tdt', TDT_UPLOAD='foo'))
+        tdt_sync = TDTController(dict(TYPE='tdt'))
+        tdt = TDTController(dict(TYPE='tdt', TDT_UPLOAD='async'))
+    assert_true(not tdt_sync._async_upload)
+    _, bufs_sync = _record_writes(tdt_sync)
+    rpcox, bufs = _record_writes(tdt)
+    rpcox.latency = 0.01
+    data = np.random.RandomState(0).rand(1000, 2).astype(np.float32)
+    orig_chunk = _tdt_controller._UPLOAD_CHUNK
+    _tdt_controller._UPLOAD_CHUNK = 100  # 20 writes
+    try:
+        assert_true(tdt_sync.load_buffer(data) is None)
+        upload = tdt.load_buffer(data)
+        assert_true(not upload.done())
+        assert_true(not tdt.playing)
+        t0 = time.time()
+        tdt.play()  # waits for the upload
+        assert_true(upload.done())
+        assert_true(time.time() - t0 > 0.05)
+        assert_true(tdt.playing)
+        tdt.stop()
+        for ci, key in enumerate(('datainleft', 'datainright')):
+            assert_array_equal(bufs[key], bufs_sync[key])
+            assert_array_equal(bufs[key][1:1001], data[:, ci])
+        # loading again cancels the upload in progress
+        upload = tdt.load_buffer(data[:500])
+        tdt.load_buffer(data[:200])
+        assert_true(upload.done())
+        assert_true(not tdt.playing)
+        tdt.play()
+        time.sleep(0.05)
+        assert_true(not tdt.playing)  # 200 samples are done by now
+        # queueing waits, too
+        tdt.load_buffer(data[:200])
+        tdt._queue_prepared(tdt._prepare_buffer(data[200:400])[0])
+        assert_array_equal(bufs['datainleft'][1:401], data[:400, 0])
+        # errors get raised when playing (until new data are loaded)
+        write = rpcox.WriteTagVEX
+        rpcox.WriteTagVEX = None  # not callable
+        tdt.load_buffer(data)
+        assert_raises(TypeError, tdt.play)
+        assert_raises(TypeError, tdt.play)
+        assert_raises(TypeError, tdt._queue_prepared,
+                      tdt._prepare_buffer(data)[0])
+        assert_true(not tdt.playing)
+        rpcox.WriteTagVEX = write
+        tdt.load_buffer(data[:200])
+        tdt.play()
+        assert_true(tdt.playing)
+        tdt.stop()
+    finally:
+        _tdt_controller._UPLOAD_CHUNK = orig_chunk
+        tdt.halt()
+        tdt_sync.halt()
+
+
+def test_tdt_stream():
+    """Test streaming through a circular TDT buffer."""
+    with warnings.catch_warnings(record=True):  # dummy mode
+        tdt = TDTController(dict(TYPE='tdt'))
+    orig = (_tdt_controller._RING_SAMPLES, _tdt_controller._RING_CHUNK,
+            _tdt_controller._RING_POLL)
+    _tdt_controller._RING_SAMPLES = 1000
+    _tdt_controller._RING_CHUNK = 100
+    _tdt_controller._RING_POLL = 0.001
+    try:
+        data = np.random.RandomState(0).randint(-2 ** 15, 2 ** 15, 3000)
+        data = data.astype(np.int16)
+        want = np.clip((data / 32767.).astype(np.float32) * np.float32(1.5),
+                       -1, 1)
+        tdt.load_stream(data, 1.5)
+        tdt._stream.wait()  # filled in the background
+        rpcox = tdt.rpcox._rpcox
+        writes = list()
+        orig_write = rpcox.WriteTagVEX
+
+        def write(name, offset, kind, data):
+            assert_true(1 <= offset and offset + len(data) <= 1001)
+            if name == 'datainright':
+                writes.append(np.array(data))
+            return orig_write(name, offset, kind, data)
+        rpcox.WriteTagVEX = write
+        for latency, n_underruns in ((0., 0), (0.02, 1)):
+            tdt.stop()  # rewinds (fills the ring again)
+            tdt._stream.wait()
+            assert_array_equal(np.concatenate(writes), want[:1000])
+            rpcox.latency = latency
+            tdt.play()
+            tdt._stream._thread.join()
+            assert_array_equal(np.concatenate(writes), want)
+            if n_underruns:  # too slow
+                assert_true(tdt._stream.n_underruns >= n_underruns)
+            else:
+                assert_equal(tdt._stream.n_underruns, 0)
+            while tdt.playing:
+                time.sleep(0.01)
+            del writes[:]
+        # refilling does not hold up stopping, but playing waits for it
+        rpcox.latency = 0.01  # 20 writes
+        t0 = time.time()
+        tdt.stop()
+        assert_true(time.time() - t0 < 0.1)
+        assert_true(len(writes) < 10)
+        tdt.play()
+        assert_true(time.time() - t0 >= 0.2)
+        assert_array_equal(np.concatenate(writes[:10]), want[:1000])
+        tdt.stop()
+        rpcox.latency = 0.
+        assert_raises(RuntimeError, tdt._queue_prepared,
+                      tdt._prepare_buffer(want[:, np.newaxis])[0])
+        tdt.load_buffer(np.zeros((10, 2), np.float32))
+        assert_true(tdt._stream is None)
+        tdt._ring_ok = False
+        assert_raises(RuntimeError, tdt.load_stream, data, 1.)
+    finally:
+        (_tdt_controller._RING_SAMPLES, _tdt_controller._RING_CHUNK,
+         _tdt_controller._RING_POLL) = orig
+        tdt.halt()
+
+
+def test_tdt_tags():
+    """Test reading TDT tags and button presses incrementally."""
+    with warnings.catch_warnings(record=True):  # dummy mode
+        tdt = TDTController(dict(TYPE='tdt'))
+    # no window to get keyboard events from
+    tdt._retrieve_keyboard_events = lambda live_keys: []
+    tdt._clear_keyboard_events = lambda: None
+    rpcox = tdt.rpcox
+    reads = list()
+    orig_read = rpcox.ReadTagVEX
+
+    def read(name, offset, n, *args):
+        reads.append((name, offset, n))
+        return orig_read(name, offset, n, *args)
+    rpcox.ReadTagVEX = read
+    orig_age = _tdt_controller._TAG_MAX_AGE['npressabs']
+    _tdt_controller._TAG_MAX_AGE['npressabs'] = 10.
+    try:
+        tdt._clear_events()
+        assert_equal(tdt._retrieve_events(None), [])
+        rpcox._press(1)
+        rpcox._press(3)
+        assert_equal(tdt._retrieve_events(None), [])  # coalesced read
+        assert_equal(tdt._tag_stats['npressabs'][0], 1)
+        tdt._tag_cache.clear()
+        presses = tdt._retrieve_events(None)
+        assert_equal([p[0] for p in presses], ['1', '3'])
+        assert_equal(reads, [('presstimesabs', 0, 2), ('pressvalsabs', 1, 2)])
+        rpcox._press(2)
+        tdt._tag_cache.clear()
+        presses_2 = tdt._retrieve_events(None)
+        assert_equal(presses_2[:2], presses)
+        assert_equal(presses_2[2][0], '2')
+        assert_equal(reads[2:], [('presstimesabs', 2, 1),
+                                 ('pressvalsabs', 3, 1)])
+        tdt._tag_cache.clear()
+        assert_equal(len(tdt._retrieve_events(None)), 3)
+        assert_equal(len(reads), 4)  # nothing new to read
+        assert_equal(tdt._tag_stats['presstimesabs'][0], 2)
+        assert_equal(tdt._tag_stats['npressabs'][0], 4)
+        tdt._clear_events()
+        assert_equal(tdt._retrieve_events(None), [])
+        # triggers make "playing" be read again
+        tdt.load_buffer(np.zeros((10000, 2), np.float32))
+        assert_true(not tdt.playing)
+        tdt.play()
+        assert_true(tdt.playing)
+        tdt.stop()
+        assert_true(not tdt.playing)
+        # triggers stamped from other threads clear the cache
+        stop = Event()
+
+        def clear():
+            while not stop.is_set():
+                tdt._trigger(0)
+        thread = Thread(target=clear)
+        thread.start()
+        try:
+            for _ in range(1000):
+                assert_true(not tdt.playing)
+        finally:
+            stop.set()
+            thread.join()
+    finally:
+        _tdt_controller._TAG_MAX_AGE['npressabs'] = orig_age
+        tdt.halt()
+
+
+def test_tdt_triggers():
+    """Test stamping TDT triggers from the calling thread."""
+    with warnings.catch_warnings(record=True):  # dummy mode
+        tdt = TDTController(dict(TYPE='tdt'))
+    rpcox = tdt.rpcox._rpcox
+    stamped = list()
+    rpcox.SetTagVal = lambda name, val: (
+        stamped.append((val, current_thread())) or True)
+    try:
+        t0 = time.time()
+        done = tdt.stamp_triggers([4, 8], delay=0.02, wait_for_last=False)
+        assert_true(done.is_set())  # stamped, without the final delay
+        assert_true(0.02 <= time.time() - t0 < 0.04)
+        tdt._scheduler.wait_idle()  # as the ExperimentController does
+        assert_true(time.time() - t0 >= 0.04)
+        tdt.play()  # sets its own trigger value
+        assert_equal([s[0] for s in stamped], [4, 8, 1])
+        assert_true(all(s[1] is current_thread() for s in stamped))
+    finally:
+        tdt.halt()
+
+
+def test_tdt_com():
+    """Test that a real (COM) TDT is not used from other threads."""
+    _tdt_controller.DummyRPcoX._oleobj_ = None  # looks like COM
+    try:
+        with warnings.catch_warnings(record=True):  # dummy mode
+            tdt = TDTController(dict(TYPE='tdt', TDT_UPLOAD='async'))
+    finally:
+        del _tdt_controller.DummyRPcoX._oleobj_
+    try:
+        assert_true(not tdt.rpcox.threads_ok)
+        assert_true(not tdt._async_upload)
+        assert_true(tdt.load_buffer(np.zeros((10, 2), np.float32)) is None)
+        assert_raises(RuntimeError, tdt.load_stream,
+                      np.zeros(10, np.int16), 1.)
+    finally:
+        tdt.halt()
+    with warnings.catch_warnings(record=True):  # dummy mode
+        tdt = TDTController(dict(TYPE='tdt'))
+    assert_true(tdt.rpcox.threads_ok)
+    tdt.halt()
@@ -0,0 +1,116 @@
+import os.path as op
+
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+from numpy.testing import assert_allclose
+
+from expyfun import TriggerController, register_trigger_backend
+from expyfun._trigger_controllers import (ParallelTrigger, FileTrigger,
+                                          _TriggerScheduler, _trigger_backends)
+from expyfun._utils import clock, _TempDir
+
+
+def test_trigger_scheduler():
+    """Test stamping triggers from a background thread."""
+    stamped = list()
+    tc = ParallelTrigger('dummy')
+    tc._stamp_trigger = lambda trig: stamped.append((trig, clock()))
+    try:
+        delay = 0.02
+        t0 = clock()
+        done = tc.stamp_triggers([4, 8, 4], delay=delay, wait_for_last=False)
+        assert_true(clock() - t0 < delay)  # returns right away
+        done_2 = tc.stamp_triggers([8], delay=delay, wait_for_last=False)
+        assert_true(done.wait(1.))
+        assert_true(done_2.wait(1.))
+        assert_equal([s[0] for s in stamped], [4, 8, 4, 8])
+        # the second train waits for the first (and its final delay)
+        times = np.array([s[1] for s in stamped])
+        assert_allclose(np.diff(times), delay, atol=0.01)
+        # waiting includes the final delay
+        t0 = clock()
+        assert_true(tc.stamp_triggers([1, 2], delay=delay).is_set())
+        assert_true(clock() - t0 >= 2 * delay - 1e-3)
+    finally:
+        tc.close()
+    # deadlines, stamp times, and errors
+    stamped = list()
+
+    def stamp(trig):
+        if trig < 0:
+            raise ValueError('bad trigger')
+        stamped.append(trig)
+    scheduler = _TriggerScheduler(stamp)
+    try:
+        train = scheduler.stamp_triggers([1, 2, 3], 0.01, False)
+        train.wait()
+        assert_equal(len(train.times), 3)
+        assert_allclose(np.diff(train.deadlines), 0.01)
+        assert_true(np.all(np.array(train.times) >= train.deadlines))
+        train = scheduler.stamp_triggers([4, -1, 5], 0.01, False)
+        assert_raises(ValueError, train.wait)
+        assert_raises(ValueError, scheduler.stamp_triggers, [-1], 0.01)
+        scheduler.stamp_triggers([6], 0.01, False)
+    finally:
+        scheduler.close()  # stamps what is left
+    assert_equal(stamped, [1, 2, 3, 4, 6])
+    # it can be used again after closing
+    try:
+        train = scheduler.stamp_triggers([7, 8], 0.02, False)
+        assert_true(train.done.wait(1.))
+        assert_equal(stamped[-2:], [7, 8])
+        # waiting until idle includes the final delay
+        train = scheduler.stamp_triggers([9, 10], 0.02, False)
+        scheduler.wait_idle()
+        assert_true(train.done.is_set())
+        assert_true(scheduler.clock() >= train.deadlines[-1] + 0.02)
+        t0 = clock()
+        scheduler.wait_idle()  # nothing to wait for
+        assert_true(clock() - t0 < 0.01)
+    finally:
+        scheduler.close()
+    assert_equal(stamped[-4:], [7, 8, 9, 10])
+
+
+def test_trigger_backends():
+    """Test the trigger backend registry and the file backend."""
+    fname = op.join(_TempDir(), 'triggers.bin')
+    tc = _trigger_backends['file'](None, dict(type='file', fname=fname))
+    assert_true(isinstance(tc, FileTrigger))
+    try:
+        t0 = clock()
+        tc.stamp_triggers([4, 8, 4], delay=0.01, wait_for_last=False).wait()
+    finally:
+        tc.close()
+    trigs = np.fromfile(fname, [('time', '<f8'), ('trigger', '<u4')])
+    assert_equal(list(trigs['trigger']), [4, 8, 4])
+    assert_true(np.all(trigs['time'] >= t0))
+    assert_allclose(np.diff(trigs['time']), 0.01, atol=0.01)
+
+    class _Ec(object):
+        _ac = None
+    assert_raises(ValueError, _trigger_backends['tdt'], _Ec(), dict())
+    assert_true(isinstance(_trigger_backends['dummy'](
+        _Ec(), dict(type='dummy')), ParallelTrigger))
+
+    # new backends
+    class RecordingTrigger(TriggerController):
+        def __init__(self):
+            self.stamped = list()
+            super(RecordingTrigger, self).__init__('recording')
+
+        def _stamp_trigger(self, trig):
+            self.stamped.append(trig)
+
+    assert_raises(TypeError, register_trigger_backend, 1, RecordingTrigger)
+    assert_raises(TypeError, register_trigger_backend, 'recording', 1)
+    register_trigger_backend('recording', lambda ec, params:
+                             RecordingTrigger())
+    try:
+        tc = _trigger_backends['recording'](None, dict(type='recording'))
+        tc.stamp_triggers([1, 2], delay=0.)
+        tc.close()
+        assert_equal(tc.stamped, [1, 2])
+    finally:
+        del _trigger_backends['recording']
+    assert_raises(NotImplementedError, TriggerController()._stamp_trigger, 1)
@@ -1,8 +1,12 @@
 from nose.tools import assert_true, assert_raises, assert_equal
+import numpy as np
+from numpy.testing import assert_allclose
 import os
 import warnings
 
-from expyfun._utils import get_config, set_config, deprecated, _fix_audio_dims
+from expyfun import _utils
+from expyfun._utils import (get_config, set_config, deprecated,
+                            _fix_audio_dims, running_rms, _max_running_rms)
 
 warnings.simplefilter('always')
 
@@ -72,3 +76,34 @@ def test_audio_dims():
     assert_raises(ValueError, _fix_audio_dims, y1, 3)
     from numpy import zeros
     assert_raises(ValueError, _fix_audio_dims, zeros((2, 2, 2)))
+
+
+def test_running_rms():
+    """Test running RMS calculation"""
+    rng = np.random.RandomState(0)
+    win = 7
+    orig_block = _utils._RMS_BLOCK
+    _utils._RMS_BLOCK = 10  # several (partial) blocks
+    try:
+        for x in (rng.randn(3), rng.randn(7), rng.randn(8), rng.randn(100),
+                  rng.randn(2, 55).astype(np.float32)):
+            want = [np.sqrt(np.convolve(xx.astype(np.float64) ** 2,
+                                        np.ones(win) / win, 'valid'))
+                    for xx in np.atleast_2d(x)]
+            want = np.array(want).reshape(x.shape[:-1] + (-1,))
+            got = running_rms(x, win)
+            assert_equal(got.shape, want.shape)
+            assert_allclose(got, want, rtol=1e-6, atol=1e-12)
+            assert_allclose(_max_running_rms(x, win), want.max(), rtol=1e-6)
+        # stop once the limit is exceeded
+        x = np.zeros(100)
+        x[:win] = 1.
+        x[50:] = 2.
+        assert_allclose(_max_running_rms(x, win), 2.)
+        assert_allclose(_max_running_rms(x, win, 2.5), 2.)
+        assert_allclose(_max_running_rms(x, win, 0.5), 1.)
+        # no catastrophic cancellation after loud parts
+        x = np.concatenate([1e3 * np.ones(1000), 1e-3 * np.ones(1000)])
+        assert_allclose(running_rms(x, win)[-1], 1e-3, rtol=1e-6)
+    finally:
+        _utils._RMS_BLOCK = orig_block